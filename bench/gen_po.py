@@ -0,0 +1,362 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Copyright © 2021 Osamu Aoki
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the
+"Software"), to deal in the Software without restriction, including
+without limitation the rights to use, copy, modify, merge, publish,
+distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to
+the following conditions:
+
+The above copyright notice and this permission notice shall be included
+in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Generator of reproducible synthetic PO files for the benchmarks
+"""
+import argparse
+import itertools
+import random
+import sys  # sys.stderr etc.
+
+#######################################################################
+# Synthetic strings
+#######################################################################
+version = 1  # bump when the output for the same options changes
+styles = ("docbook", "itstool", "plain")
+letters = "abcdefghijklmnopqrstuvwxyz"
+
+
+class Generator:
+    """
+    Synthetic catalog of n entries: the same seed gives the same entries
+
+    The words follow a Zipf law like a natural language text.  Each entry
+    has the extracted comment and the references of style, and a status
+    (translated, untranslated, fuzzy, fuzzy with the previous msgid, or
+    obsolete) chosen with the given fractions.  The translation reverses
+    each word and keeps the tags, so msgid and msgstr match for po_check
+    except in the broken fraction of entries.
+    """
+
+    def __init__(
+        self,
+        n,
+        seed=1,
+        style="docbook",
+        untranslated=0.1,
+        fuzzy=0.05,
+        previous=0.05,
+        obsolete=0.02,
+        long=0.05,
+        broken=0.01,
+    ):
+        self.n = n
+        self.seed = seed
+        self.style = style
+        self.fractions = (untranslated, fuzzy, previous, obsolete)
+        self.long = long
+        self.broken = broken
+        vocab_rng = random.Random(0)  # the same words for any seed
+        self.vocab = [
+            "".join(vocab_rng.choice(letters) for _ in range(vocab_rng.randint(2, 10)))
+            for _ in range(20000)
+        ]
+        self.cum = list(
+            itertools.accumulate(1.0 / (r + 1) for r in range(len(self.vocab)))
+        )
+        return
+
+    def words(self, rng, k):
+        return rng.choices(self.vocab, cum_weights=self.cum, k=k)
+
+    def sentence(self, rng, k):
+        words = self.words(rng, k)
+        words[0] = words[0].capitalize()
+        if self.style == "plain":
+            if rng.random() < 0.2:
+                words[rng.randrange(k)] = '\\"%s\\"'
+            return " ".join(words) + "."
+        for _ in range(rng.randint(0, 2)):
+            i = rng.randrange(k)
+            j = min(k, i + rng.randint(1, 3))
+            words[i : j] = [self.tag(rng, " ".join(words[i:j]))]
+        return " ".join(words) + "."
+
+    def tag(self, rng, text):
+        if self.style == "docbook":
+            name = rng.choice(("emphasis", "command", "literal", "filename"))
+            if rng.random() < 0.1:
+                return '<ulink url=\\"http://{}.example.org/\\">{}</ulink>'.format(
+                    self.words(rng, 1)[0], text
+                )
+            if rng.random() < 0.1:
+                return '<placeholder type=\\"footnote\\" id=\\"{}\\"/>'.format(
+                    rng.randint(0, 2)
+                )
+        else:
+            name = rng.choice(("em", "cmd", "code", "file"))
+            if rng.random() < 0.1:
+                return "<_:link-{}/>".format(rng.randint(1, 3))
+        return "<{0}>{1}</{0}>".format(name, text)
+
+    def text(self, rng):
+        """
+        Return (element, msgid) of a title, a paragraph or a screen
+        """
+        r = rng.random()
+        if r < self.long:
+            # long paragraph or multi-line screen
+            if self.style != "plain" and rng.random() < 0.5:
+                lines = [
+                    "$ " + " ".join(self.words(rng, rng.randint(2, 8)))
+                    for _ in range(rng.randint(5, 30))
+                ]
+                return "screen", "\\n".join(lines)
+            return "para", " ".join(
+                self.sentence(rng, rng.randint(8, 30))
+                for _ in range(rng.randint(5, 20))
+            )
+        if r < 0.3:
+            return "title", self.sentence(rng, rng.randint(1, 5))[:-1]
+        return "para", " ".join(
+            self.sentence(rng, rng.randint(4, 25)) for _ in range(rng.randint(1, 4))
+        )
+
+    def translate(self, text, rng):
+        out = []
+        for w in text.split(" "):
+            if "<" in w or ">" in w or "\\" in w or "%" in w:
+                out.append(w)
+            else:
+                out.append(w[::-1])
+        if rng.random() < self.broken and "</" in text:
+            # a lost closing tag for the XML checks
+            i = max(i for i, w in enumerate(out) if "</" in w)
+            out[i] = out[i].split("</")[0]
+        return " ".join(out)
+
+    def header(self):
+        return [
+            'msgid ""',
+            'msgstr ""',
+            '"Project-Id-Version: synthetic {} {}\\n"'.format(self.style, self.n),
+            '"Language: ja\\n"',
+            '"MIME-Version: 1.0\\n"',
+            '"Content-Type: text/plain; charset=UTF-8\\n"',
+            '"Content-Transfer-Encoding: 8bit\\n"',
+            "",
+        ]
+
+    def entries(self):
+        """
+        Yield (extracted, references, element, status, msgctxt, msgid,
+        msgstr, previous msgid) of each entry
+        """
+        rng = random.Random(self.seed)
+        seen = set()
+        untranslated, fuzzy, previous, obsolete = self.fractions
+        line = 1
+        for i in range(self.n):
+            element, msgid = self.text(rng)
+            if element == "title":
+                # short strings repeat by the Zipf law: keep msgid unique
+                if msgid in seen:
+                    msgid += " {}".format(i)
+                seen.add(msgid)
+            msgctxt = ""
+            if self.style == "plain" and rng.random() < 0.02:
+                msgctxt = " ".join(self.words(rng, 2))
+            if self.style == "docbook":
+                extracted = "#. type: Content of: <book><chapter><section><{}>".format(
+                    element
+                )
+            elif self.style == "itstool":
+                extracted = "#. (itstool) path: section/{}".format(element)
+            else:
+                extracted = "#. TRANSLATORS: {}".format(element)
+            refs = []
+            for _ in range(1 if rng.random() < 0.9 else rng.randint(2, 4)):
+                line += rng.randint(1, 40)
+                refs.append("{}:{}".format(self.source(i), line))
+            r = rng.random()
+            if r < untranslated:
+                status = "untranslated"
+            elif r < untranslated + fuzzy:
+                status = "fuzzy"
+            elif r < untranslated + fuzzy + previous:
+                status = "previous"
+            elif r < untranslated + fuzzy + previous + obsolete:
+                status = "obsolete"
+            else:
+                status = "translated"
+            msgstr = self.translate(msgid, rng)
+            pmsgid = ""
+            if status == "previous":
+                words = msgid.split(" ")
+                k = rng.randrange(len(words))
+                if "<" not in words[k] and ">" not in words[k]:
+                    words[k] = self.words(rng, 1)[0]
+                pmsgid = " ".join(words)
+            yield (extracted, refs, element, status, msgctxt, msgid, msgstr, pmsgid)
+        return
+
+    def source(self, i):
+        chapter = 1 + i * 20 // max(self.n, 1)
+        if self.style == "docbook":
+            return "en/ch{:02d}.xml".format(chapter)
+        elif self.style == "itstool":
+            return "C/page{:02d}.page".format(chapter)
+        return "src/file{:02d}.c".format(chapter)
+
+    def write(self, file=sys.stdout, mode="po"):
+        """
+        Write the catalog as PO ("po"), master POT ("pot") or the POT of
+        the translated source ("tpot") to file
+
+        The entries of "pot" and "tpot" are paired for combine_pots().
+        """
+        file.write("\n".join(self.header()) + "\n")
+        obsolete = []
+        for (extracted, refs, element, status, msgctxt, msgid, msgstr, pmsgid) in (
+            self.entries()
+        ):
+            if mode == "tpot":
+                refs = [ref.replace("en/", "ja/", 1) for ref in refs]
+                msgid = msgstr
+            if mode != "po":
+                msgstr = ""
+                pmsgid = ""
+                status = "untranslated" if status != "obsolete" else status
+            elif status == "untranslated":
+                msgstr = ""
+            if status == "obsolete":
+                if mode == "po":
+                    obsolete.append(
+                        po_string("msgid", msgid, prefix="#~ ")
+                        + po_string("msgstr", msgstr, prefix="#~ ")
+                    )
+                continue
+            lines = [extracted, "#: " + " ".join(refs)]
+            flags = []
+            if status in ("fuzzy", "previous"):
+                flags.append("fuzzy")
+            if "%s" in msgid:
+                flags.append("c-format")
+            if flags:
+                lines.append("#, " + ", ".join(flags))
+            if pmsgid:
+                lines.extend(po_string("msgid", pmsgid, prefix="#| "))
+            if msgctxt:
+                lines.extend(po_string("msgctxt", msgctxt))
+            lines.extend(po_string("msgid", msgid))
+            lines.extend(po_string("msgstr", msgstr))
+            lines.append("")
+            file.write("\n".join(lines) + "\n")
+        for lines in obsolete:
+            file.write("\n".join(lines) + "\n\n")
+        return
+
+
+def po_string(keyword, text, prefix="", width=79):
+    """
+    Return the lines of a PO string wrapped at spaces and after \\n
+    """
+    first = '{}{} "{}"'.format(prefix, keyword, text)
+    body = text[:-2] if text.endswith("\\n") else text
+    if len(first) <= width and "\\n" not in body:
+        return [first]
+    lines = ['{}{} ""'.format(prefix, keyword)]
+    size = width - len(prefix) - 2
+    for part in text.replace("\\n", "\\n\0").split("\0"):
+        while len(part) > size:
+            cut = part.rfind(" ", 0, size) + 1
+            if cut <= 0:
+                cut = len(part)
+            lines.append('{}"{}"'.format(prefix, part[:cut]))
+            part = part[cut:]
+        if part:
+            lines.append('{}"{}"'.format(prefix, part))
+    return lines
+
+
+#######################################################################
+# main program
+#######################################################################
+def gen_po():
+    name = "gen_po"
+    p = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="""\
+{0}: generate a reproducible synthetic PO file for the benchmarks
+""".format(
+            name
+        ),
+        epilog="""\
+The same options and seed give the same file.  With -m pot and -m tpot,
+the master POT and the POT of the translated source are generated as the
+input pair of po_combine.
+""",
+    )
+    p.add_argument(
+        "-n", "--entries", type=int, default=1000, help="number of entries"
+    )
+    p.add_argument("-s", "--seed", type=int, default=1, help="random seed")
+    p.add_argument(
+        "-t", "--style", choices=styles, default="docbook", help="tags and comments"
+    )
+    p.add_argument(
+        "-m",
+        "--mode",
+        choices=("po", "pot", "tpot"),
+        default="po",
+        help="PO file, master POT or translated POT (default: po)",
+    )
+    for option, default, what in (
+        ("untranslated", 0.1, "untranslated entries"),
+        ("fuzzy", 0.05, "fuzzy entries"),
+        ("previous", 0.05, "fuzzy entries with the previous msgid"),
+        ("obsolete", 0.02, "obsolete entries"),
+        ("long", 0.05, "long paragraphs and multi-line screens"),
+        ("broken", 0.01, "translations with a lost closing tag"),
+    ):
+        p.add_argument(
+            "--" + option,
+            type=float,
+            default=default,
+            help="fraction of {} (default: {})".format(what, default),
+        )
+    p.add_argument("output", help="output file name (- for stdout)")
+    args = p.parse_args()
+    generator = Generator(
+        args.entries,
+        seed=args.seed,
+        style=args.style,
+        untranslated=args.untranslated,
+        fuzzy=args.fuzzy,
+        previous=args.previous,
+        obsolete=args.obsolete,
+        long=args.long,
+        broken=args.broken,
+    )
+    if args.output == "-":
+        generator.write(file=sys.stdout, mode=args.mode)
+    else:
+        with open(args.output, "w") as fp:
+            generator.write(file=fp, mode=args.mode)
+    return
+
+
+#######################################################################
+if __name__ == "__main__":
+    gen_po()
@@ -0,0 +1,983 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Copyright © 2021 Osamu Aoki
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the
+"Software"), to deal in the Software without restriction, including
+without limitation the rights to use, copy, modify, merge, publish,
+distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to
+the following conditions:
+
+The above copyright notice and this permission notice shall be included
+in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Benchmark runner timing the PotData methods and the po_* commands
+"""
+import argparse
+import contextlib
+import datetime
+import gc
+import importlib
+import json
+import os  # for os.path.basename etc.
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys  # sys.stderr etc.
+import tempfile
+import time
+
+import gen_po
+
+poutils = None  # imported from --source by main()
+
+#######################################################################
+# Benchmark cases
+#######################################################################
+# PotData method name -> list of (variant, function(ctx) returning the
+# function to time).  Setup in function(ctx) is not timed.
+methods = {}
+
+
+def method(name, variant=""):
+    def register(func):
+        methods.setdefault(name, []).append((variant, func))
+        return func
+
+    return register
+
+
+def sample(items, k=1000):
+    step = max(len(items) // k, 1)
+    return items[::step][:k]
+
+
+class Context:
+    """
+    Synthetic input files of one size and the PotData parsed from them
+    """
+
+    def __init__(self, files, work):
+        self.files = files
+        self.work = work
+        self.shared = None
+        return
+
+    def parse(self, name="po"):
+        master = poutils.PotData()
+        with open(self.files[name], "r") as fp:
+            master.read_po(file=fp)
+        return master
+
+    def master(self):
+        """
+        Return PotData of the PO file shared by the cases not changing it
+        """
+        if self.shared is None:
+            self.shared = self.parse()
+        return self.shared
+
+    def copy(self, name="po"):
+        """
+        Return the path of a fresh copy of the input file name in work
+        """
+        path = os.path.join(self.work, os.path.basename(self.files[name]))
+        shutil.copyfile(self.files[name], path)
+        return path
+
+
+def devnull(mode="w"):
+    return open(os.devnull, mode)
+
+
+@method("append")
+def bench_append(ctx):
+    items = ctx.master().items
+
+    def run():
+        data = poutils.PotData()
+        for item in items:
+            data.append(item)
+
+    return run
+
+
+@method("invalidate")
+def bench_invalidate(ctx):
+    # the cost of an invalidation is rebuilding the index on the next lookup
+    master = ctx.master()
+    msgid = master[len(master) // 2].msgid
+    master.find(msgid)
+
+    def run():
+        master.invalidate()
+        master.find(msgid)
+
+    return run
+
+
+@method("index")
+def bench_index(ctx):
+    master = ctx.master()
+    master.invalidate()
+
+    def run():
+        for name in master.index_keys:
+            master.index(name)
+
+    return run
+
+
+@method("find")
+def bench_find(ctx):
+    master = ctx.master()
+    queries = [(item.msgid, item.msgctxt) for item in sample(master.items)]
+    master.index("msgid")
+
+    def run():
+        for msgid, msgctxt in queries:
+            master.find(msgid, msgctxt)
+
+    return run
+
+
+@method("find_all")
+def bench_find_all(ctx):
+    master = ctx.master()
+    queries = [item.msgstr for item in sample(master.items)]
+    master.index("msgstr")
+
+    def run():
+        for msgstr in queries:
+            master.find_all(msgstr=msgstr)
+
+    return run
+
+
+@method("by_reference")
+def bench_by_reference(ctx):
+    master = ctx.master()
+    queries = [
+        item.reference[0][3:].split(" ")[0]
+        for item in sample(master.items)
+        if len(item.reference) != 0
+    ]
+    master.index("reference")
+
+    def run():
+        for ref in queries:
+            master.by_reference(ref)
+
+    return run
+
+
+@method("iter_po")
+def bench_iter_po(ctx):
+    def run():
+        with open(ctx.files["po"], "r") as fp:
+            for item in poutils.PotData().iter_po(file=fp):
+                pass
+
+    return run
+
+
+@method("read_po")
+def bench_read_po(ctx):
+    def run():
+        with open(ctx.files["po"], "r") as fp:
+            poutils.PotData().read_po(file=fp)
+
+    return run
+
+
+@method("iter_po_bytes")
+def bench_iter_po_bytes(ctx):
+    with open(ctx.files["po"], "rb") as fp:
+        data = fp.read()
+
+    def run():
+        for item in poutils.PotData().iter_po_bytes(data):
+            pass
+
+    return run
+
+
+@method("iter_po_mmap")
+def bench_iter_po_mmap(ctx):
+    def run():
+        with open(ctx.files["po"], "rb") as fp:
+            for item in poutils.PotData().iter_po_mmap(fp):
+                pass
+
+    return run
+
+
+@method("read_po_mmap")
+def bench_read_po_mmap(ctx):
+    def run():
+        with open(ctx.files["po"], "rb") as fp:
+            poutils.PotData().read_po_mmap(fp)
+
+    return run
+
+
+@method("iter_po_spans")
+def bench_iter_po_spans(ctx):
+    with open(ctx.files["po"], "rb") as fp:
+        data = fp.read()
+
+    def run():
+        for span in poutils.PotData().iter_po_spans(data, size=1 << 20):
+            pass
+
+    return run
+
+
+@method("read_po_parallel")
+def bench_read_po_parallel(ctx):
+    def run():
+        poutils.PotData().read_po_parallel(ctx.files["po"])
+
+    return run
+
+
+@method("read_po_cached", "miss")
+def bench_read_po_cached_miss(ctx):
+    path = ctx.copy()
+
+    def run():
+        poutils.PotData().read_po_cached(path)
+
+    return run
+
+
+@method("read_po_cached", "hit")
+def bench_read_po_cached_hit(ctx):
+    path = ctx.copy()
+    poutils.PotData().read_po_cached(path)
+
+    def run():
+        poutils.PotData().read_po_cached(path)
+
+    return run
+
+
+@method("set_all_index")
+def bench_set_all_index(ctx):
+    master = ctx.parse()
+    return master.set_all_index
+
+
+@method("set_all_syncid")
+def bench_set_all_syncid(ctx):
+    master = ctx.parse()
+    master.set_all_index()
+    return master.set_all_syncid
+
+
+@method("output_raw")
+def bench_output_raw(ctx):
+    master = ctx.master()
+
+    def run():
+        with devnull() as fp:
+            master.output_raw(file=fp)
+
+    return run
+
+
+@method("write_raw")
+def bench_write_raw(ctx):
+    master = ctx.master()
+
+    def run():
+        with devnull() as fp:
+            master.write_raw(iter(master.items), file=fp)
+
+    return run
+
+
+@method("output_raw_bytes")
+def bench_output_raw_bytes(ctx):
+    master = ctx.master()
+
+    def run():
+        with devnull("wb") as fp:
+            master.output_raw_bytes(file=fp)
+
+    return run
+
+
+@method("write_raw_bytes")
+def bench_write_raw_bytes(ctx):
+    master = ctx.master()
+
+    def run():
+        with devnull("wb") as fp:
+            master.write_raw_bytes(iter(master.items), file=fp)
+
+    return run
+
+
+@method("output_po")
+def bench_output_po(ctx):
+    master = ctx.master()
+
+    def run():
+        with devnull() as fp:
+            master.output_po(file=fp)
+
+    return run
+
+
+@method("write_po")
+def bench_write_po(ctx):
+    master = ctx.master()
+
+    def run():
+        with devnull() as fp:
+            master.write_po(iter(master.items), file=fp)
+
+    return run
+
+
+@method("write_uniq")
+def bench_write_uniq(ctx):
+    master = ctx.master()
+
+    def run():
+        with devnull() as fp:
+            master.write_uniq(iter(master.items), file=fp)
+
+    return run
+
+
+@method("format_item")
+def bench_format_item(ctx):
+    master = ctx.master()
+    pairs = [
+        (item, [*item.comment, *item.extracted, *item.reference, *item.flag])
+        for item in master
+        if len(item.obsolete) == 0
+    ]
+
+    def run():
+        for item, lines in pairs:
+            master.format_item(item, lines)
+
+    return run
+
+
+@method("write_mo")
+def bench_write_mo(ctx):
+    master = ctx.master()
+
+    def run():
+        with devnull("wb") as fp:
+            master.write_mo(fp)
+
+    return run
+
+
+@method("stream_po")
+def bench_stream_po(ctx):
+    def run():
+        with open(ctx.files["po"], "r") as fp_in, devnull() as fp_out:
+            poutils.PotData().stream_po(fp_in, fp_out, poutils.PotItem.rm_fuzzy)
+
+    return run
+
+
+@method("stream_po_inplace")
+def bench_stream_po_inplace(ctx):
+    path = ctx.copy()
+
+    def run():
+        poutils.PotData().stream_po_inplace(path, poutils.PotItem.rm_fuzzy)
+
+    return run
+
+
+@method("output_po_inplace")
+def bench_output_po_inplace(ctx):
+    master = ctx.master()
+    path = ctx.copy()
+
+    def run():
+        master.output_po_inplace(path)
+
+    return run
+
+
+@method("rewrite_po")
+def bench_rewrite_po(ctx):
+    path = ctx.copy()
+
+    def write(fp_in, fp_out):
+        shutil.copyfileobj(fp_in, fp_out)
+
+    def run():
+        poutils.PotData().rewrite_po(path, write)
+
+    return run
+
+
+@method("rm_fuzzy_all")
+def bench_rm_fuzzy_all(ctx):
+    return ctx.parse().rm_fuzzy_all
+
+
+@method("clean_msgstr")
+def bench_clean_msgstr(ctx):
+    master = ctx.parse()
+
+    def run():
+        master.clean_msgstr(pattern_extracted=r"<screen>", pattern_msgid=r"^https?://")
+
+    return run
+
+
+@method("dup_msgstr")
+def bench_dup_msgstr(ctx):
+    master = ctx.parse()
+
+    def run():
+        master.dup_msgstr(pattern_extracted=r"<screen>", pattern_msgid=r"^https?://")
+
+    return run
+
+
+def columns(ctx):
+    """
+    Return poutils.columns.Columns of a fresh PotData (made before timing)
+    """
+    return importlib.import_module("poutils.columns").Columns(ctx.parse())
+
+
+@method("rm_fuzzy_all", "columns")
+def bench_rm_fuzzy_all_columns(ctx):
+    return columns(ctx).rm_fuzzy_all
+
+
+@method("clean_msgstr", "columns")
+def bench_clean_msgstr_columns(ctx):
+    view = columns(ctx)
+
+    def run():
+        view.clean_msgstr(pattern_extracted=r"<screen>", pattern_msgid=r"^https?://")
+
+    return run
+
+
+@method("dup_msgstr", "columns")
+def bench_dup_msgstr_columns(ctx):
+    view = columns(ctx)
+
+    def run():
+        view.dup_msgstr(pattern_extracted=r"<screen>", pattern_msgid=r"^https?://")
+
+    return run
+
+
+@method("check_xml")
+def bench_check_xml(ctx):
+    return ctx.parse().check_xml
+
+
+@method("xml_warnings_all")
+def bench_xml_warnings_all(ctx):
+    master = ctx.master()
+
+    def run():
+        master.xml_warnings_all(master.items)
+
+    return run
+
+
+@method("wdiff_msgid", "char")
+def bench_wdiff_msgid_char(ctx):
+    master = ctx.parse()
+
+    def run():
+        master.wdiff_msgid(mode="char")
+
+    return run
+
+
+@method("wdiff_msgid", "word")
+def bench_wdiff_msgid_word(ctx):
+    master = ctx.parse()
+
+    def run():
+        master.wdiff_msgid(mode="word")
+
+    return run
+
+
+@method("previous_msgid")
+def bench_previous_msgid(ctx):
+    master = ctx.parse()
+    master.wdiff_msgid()
+    return master.previous_msgid
+
+
+@method("update_msgstr")
+def bench_update_msgstr(ctx):
+    return ctx.parse().update_msgstr
+
+
+@method("normalize")
+def bench_normalize(ctx):
+    return ctx.parse().normalize
+
+
+@method("normalize_extracted")
+def bench_normalize_extracted(ctx):
+    return ctx.parse().normalize_extracted
+
+
+def normalized_pots(ctx):
+    master = ctx.parse("pot")
+    translation = ctx.parse("tpot")
+    master.normalize()
+    translation.normalize()
+    return master, translation
+
+
+@method("combine_pots")
+def bench_combine_pots(ctx):
+    master, translation = normalized_pots(ctx)
+
+    def run():
+        master.combine_pots(translation)
+
+    return run
+
+
+@method("align_pots")
+def bench_align_pots(ctx):
+    master, translation = normalized_pots(ctx)
+
+    def run():
+        master.align_pots(translation)
+
+    return run
+
+
+@method("combine_aligned")
+def bench_combine_aligned(ctx):
+    master, translation = normalized_pots(ctx)
+
+    def run():
+        master.combine_aligned(translation)
+
+    return run
+
+
+# (case name, console script, setup arguments or None, arguments)
+# {po}, {pot}, {tpot} are copies of the input files and {db} is a file
+# in the working directory where the command runs.
+commands = [
+    ("po_align", "po_align", None, ["{po}"]),
+    ("po_check", "po_check", None, ["{po}"]),
+    ("po_check.warm", "po_check", ["{po}"], ["{po}"]),
+    ("po_clean", "po_clean", None, ["{po}"]),
+    ("po_combine", "po_combine", None, ["{pot}", "{tpot}", "combined.po"]),
+    (
+        "po_combine.sequence",
+        "po_combine",
+        None,
+        ["-s", "{pot}", "{tpot}", "combined.po"],
+    ),
+    ("po_mo", "po_mo", None, ["{po}"]),
+    ("po_previous", "po_previous", None, ["{po}"]),
+    ("po_rm_fuzzy", "po_rm_fuzzy", None, ["{po}"]),
+    ("po_tm.load", "po_tm", None, ["--db", "{db}", "load", "{po}"]),
+    (
+        "po_tm.apply",
+        "po_tm",
+        ["--db", "{db}", "load", "{po}"],
+        ["--db", "{db}", "apply", "{po}"],
+    ),
+    ("po_update", "po_update", None, ["{po}"]),
+    ("po_update.suggest", "po_update", None, ["-s", "{po}", "{po}"]),
+    ("po_wdiff", "po_wdiff", None, ["{po}"]),
+    ("poutils.run", "poutils", None, ["run", "clean,rm_fuzzy,check", "{po}"]),
+]
+
+
+def console_scripts(source):
+    """
+    Return {script: (module, function)} of the console_scripts in setup.py
+    """
+    with open(os.path.join(source, "setup.py"), "r") as fp:
+        text = fp.read()
+    return {
+        m.group(1): (m.group(2), m.group(3))
+        for m in re.finditer(r'"(\w+)=(poutils\.\w+):(\w+)"', text)
+    }
+
+
+def run_command(ctx, source, entry, argv):
+    """
+    Run a console script in a fresh working directory and return its time
+
+    The caches and the translation memory are kept in the working
+    directory via XDG_CACHE_HOME and XDG_DATA_HOME.
+    """
+    module, function = entry
+    work = ctx.work
+    env = dict(os.environ)
+    env["PYTHONPATH"] = source
+    env["XDG_CACHE_HOME"] = os.path.join(work, "cache")
+    env["XDG_DATA_HOME"] = os.path.join(work, "data")
+    code = "import sys; from {} import {}; sys.argv[0] = {!r}; {}()".format(
+        module, function, function, function
+    )
+    t = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", code] + argv,
+        cwd=work,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    t = time.perf_counter() - t
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1:])
+    return t
+
+
+#######################################################################
+# Runner
+#######################################################################
+def make_inputs(data, entries, style, seed):
+    """
+    Return {"po": path, "pot": path, "tpot": path} generated in data once
+    """
+    files = {}
+    for mode in ("po", "pot", "tpot"):
+        path = os.path.join(
+            data,
+            "synthetic-v{}-{}-{}-s{}.{}".format(
+                gen_po.version, style, entries, seed, mode
+            ),
+        )
+        if not os.path.exists(path):
+            print("I: run_bench: generating {}".format(path), file=sys.stderr)
+            generator = gen_po.Generator(entries, seed=seed, style=style)
+            with open(path + ".tmp", "w") as fp:
+                generator.write(file=fp, mode=mode)
+            os.replace(path + ".tmp", path)
+        files[mode] = path
+    return files
+
+
+def clean_dir(path):
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return
+
+
+def time_call(setup, repeat, work):
+    times = []
+    for _ in range(repeat):
+        clean_dir(work)
+        func = setup()
+        gc.collect()
+        # reports of the methods (e.g., combine_aligned) are not shown
+        with devnull() as fp, contextlib.redirect_stdout(fp):
+            t = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - t)
+    return times
+
+
+def run_cases(args, source, results):
+    scripts = console_scripts(source)
+    public = [
+        name
+        for name, value in sorted(vars(poutils.PotData).items())
+        if not name.startswith("_") and callable(value)
+    ]
+    for name in public:
+        if name not in methods:
+            print("W: run_bench: no case for PotData.{}".format(name), file=sys.stderr)
+    covered = set(entry for case, entry, setup, argv in commands)
+    for script in scripts:
+        if script not in covered:
+            print("W: run_bench: no case for {}".format(script), file=sys.stderr)
+    cases = []
+    for name in sorted(methods):
+        for variant, func in methods[name]:
+            case = "PotData." + name + ("." + variant if variant else "")
+            cases.append((case, "method", name, func))
+    for case, entry, setup, argv in commands:
+        cases.append((case, "command", entry, (setup, argv)))
+    select = re.compile(args.select) if args.select else None
+    for entries in args.entries:
+        files = make_inputs(args.data, entries, args.style, args.seed)
+        work = os.path.join(args.data, "work")
+        ctx = Context(files, work)
+        for case, kind, name, detail in cases:
+            if select and not select.search(case):
+                continue
+            key = "{}@{}".format(case, entries)
+            result = {"kind": kind, "entries": entries}
+            try:
+                if kind == "method":
+                    if name not in public:
+                        print(
+                            "I: run_bench: {}: not in this source".format(key),
+                            file=sys.stderr,
+                        )
+                        continue
+                    times = time_call(lambda: detail(ctx), args.repeat, work)
+                else:
+                    if name not in scripts:
+                        print(
+                            "I: run_bench: {}: not in this source".format(key),
+                            file=sys.stderr,
+                        )
+                        continue
+                    times = run_command_case(ctx, source, scripts[name], detail, args)
+            except Exception as err:
+                result["error"] = "{}: {}".format(type(err).__name__, err)
+                print(
+                    "E: run_bench: {}: {}".format(key, result["error"]),
+                    file=sys.stderr,
+                )
+            else:
+                result["times"] = times
+                result["min"] = min(times)
+                result["median"] = statistics.median(times)
+                print(
+                    "I: run_bench: {:<40} min {:9.4f}s  median {:9.4f}s".format(
+                        key, result["min"], result["median"]
+                    ),
+                    file=sys.stderr,
+                )
+            results[key] = result
+        shutil.rmtree(work, ignore_errors=True)
+    return
+
+
+def run_command_case(ctx, source, entry, detail, args):
+    setup, argv = detail
+    times = []
+    for _ in range(args.repeat):
+        clean_dir(ctx.work)
+        names = {name: ctx.copy(name) for name in ctx.files}
+        names["db"] = os.path.join(ctx.work, "tm.sqlite3")
+        if setup is not None:
+            run_command(ctx, source, entry, [a.format(**names) for a in setup])
+            # the setup may change the files
+            for name in ctx.files:
+                ctx.copy(name)
+        times.append(run_command(ctx, source, entry, [a.format(**names) for a in argv]))
+    return times
+
+
+#######################################################################
+# Comparison
+#######################################################################
+def compare(old, new, threshold=0.1, min_time=0.005):
+    """
+    Print the cases of two result files side by side and return the
+    number of regressions
+
+    A case regresses when its minimum time grows by more than threshold
+    (a fraction) and by more than min_time seconds, or when it fails
+    only in new.
+    """
+    regressions = 0
+    keys = [key for key in old["results"] if key in new["results"]]
+    for key in keys:
+        a = old["results"][key]
+        b = new["results"][key]
+        if "error" in a or "error" in b:
+            mark = "error" if "error" in b else "fixed"
+            if "error" in b and "error" not in a:
+                mark = "REGRESSION (error)"
+                regressions += 1
+            print("{:<44} {}".format(key, mark))
+            continue
+        ratio = b["min"] / a["min"] if a["min"] > 0 else float("inf")
+        mark = ""
+        if ratio > 1 + threshold and b["min"] - a["min"] > min_time:
+            mark = "REGRESSION"
+            regressions += 1
+        elif ratio < 1 / (1 + threshold) and a["min"] - b["min"] > min_time:
+            mark = "improved"
+        print(
+            "{:<44} {:9.4f}s {:9.4f}s {:6.2f}x  {}".format(
+                key, a["min"], b["min"], ratio, mark
+            ).rstrip()
+        )
+    for key in old["results"]:
+        if key not in new["results"]:
+            print("{:<44} only in old".format(key))
+    for key in new["results"]:
+        if key not in old["results"]:
+            print("{:<44} only in new".format(key))
+    return regressions
+
+
+#######################################################################
+# main program
+#######################################################################
+def run_bench():
+    global poutils
+    name = "run_bench"
+    bench = os.path.dirname(os.path.abspath(__file__))
+    p = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="""\
+{0}: time the PotData methods and the po_* commands on synthetic PO files
+""".format(
+            name
+        ),
+        epilog="""\
+"run_bench.py run -o old.json" times each public PotData method and each
+po_* command (run as a subprocess with its caches in a temporary
+directory) on catalogs made by gen_po.py and writes the times in JSON.
+The generated catalogs are kept in --data for the next runs.
+
+To check a change, run the same benchmark with --source pointing to the
+source trees (e.g., git worktrees) before and after it, then
+"run_bench.py compare old.json new.json" shows the ratios of the minimum
+times and exits with 1 if any case regressed.  PotData methods or
+commands missing in a source tree are skipped.
+""",
+    )
+    sub = p.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("run", help="run the benchmarks")
+    r.add_argument(
+        "-n",
+        "--entries",
+        default="1000,10000",
+        help="comma separated sizes of the catalogs (default: 1000,10000)",
+    )
+    r.add_argument(
+        "-t", "--style", choices=gen_po.styles, default="docbook", help="catalog style"
+    )
+    r.add_argument("--seed", type=int, default=1, help="random seed of gen_po")
+    r.add_argument(
+        "-r", "--repeat", type=int, default=3, help="runs of each case (default: 3)"
+    )
+    r.add_argument(
+        "-k", "--select", default=None, help="run only cases matching this regex"
+    )
+    r.add_argument(
+        "-s",
+        "--source",
+        default=os.path.dirname(bench),
+        help="poutils source tree to benchmark (default: this one)",
+    )
+    r.add_argument(
+        "-d",
+        "--data",
+        default=os.path.join(tempfile.gettempdir(), "poutils-bench"),
+        help="directory of the generated catalogs and the working files",
+    )
+    r.add_argument(
+        "-o", "--output", default="bench.json", help="JSON result file (- for stdout)"
+    )
+    c = sub.add_parser("compare", help="compare two result files")
+    c.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="slowdown flagged as a regression (default: 0.1 for 10%%)",
+    )
+    c.add_argument(
+        "--min-time",
+        type=float,
+        default=0.005,
+        help="ignore differences below this in seconds (default: 0.005)",
+    )
+    c.add_argument("old", help="JSON result file of the baseline")
+    c.add_argument("new", help="JSON result file to check")
+    args = p.parse_args()
+    if args.command == "compare":
+        with open(args.old, "r") as fp:
+            old = json.load(fp)
+        with open(args.new, "r") as fp:
+            new = json.load(fp)
+        for field in ("style", "seed", "generator"):
+            if old.get(field) != new.get(field):
+                print(
+                    "W: {}: {} differs: {} vs {}".format(
+                        name, field, old.get(field), new.get(field)
+                    ),
+                    file=sys.stderr,
+                )
+        regressions = compare(
+            old, new, threshold=args.threshold, min_time=args.min_time
+        )
+        if regressions:
+            print("E: {}: {} regressions".format(name, regressions), file=sys.stderr)
+            sys.exit(1)
+        return
+    source = os.path.abspath(args.source)
+    if not os.path.exists(os.path.join(source, "setup.py")):
+        p.error("no setup.py in {}".format(source))
+    sys.path.insert(0, source)
+    import poutils
+
+    if os.path.dirname(os.path.abspath(poutils.__file__)) != os.path.join(
+        source, "poutils"
+    ):
+        p.error("poutils is not imported from {}".format(source))
+    args.entries = [int(n) for n in args.entries.split(",")]
+    os.makedirs(args.data, exist_ok=True)
+    try:
+        rev = subprocess.run(
+            ["git", "-C", source, "describe", "--always", "--dirty"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        ).stdout.strip()
+    except OSError:
+        rev = ""
+    output = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        "git": rev,
+        "version": poutils.version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "style": args.style,
+        "seed": args.seed,
+        "generator": gen_po.version,
+        "repeat": args.repeat,
+        "results": {},
+    }
+    run_cases(args, source, output["results"])
+    if args.output == "-":
+        json.dump(output, sys.stdout, indent=1)
+        print()
+    else:
+        with open(args.output, "w") as fp:
+            json.dump(output, fp, indent=1)
+            fp.write("\n")
+    return
+
+
+#######################################################################
+if __name__ == "__main__":
+    run_bench()
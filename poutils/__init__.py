@@ -37,22 +37,335 @@ This scripts work on PO/POT file having a repeat of the following structure
    ? WHITE-SPACE
    ? WHITE-SPACE | EOF
 """
+import concurrent.futures
 import enum
+import os  # for os.path.basename etc.
 import sys  # sys.stderr etc.
+import shutil
 import re  # for non-greedy {-...-} and {+...+} handling
 import tempfile  # for temporary file
 import subprocess  # for shell pipe
-import difflib  # for wdiff
 import xml.etree.ElementTree as ET
+import xml.parsers.expat as expat
 import itertools as IT
 import io
 import codecs
+import unicodedata
+import mmap
+
+from poutils import cache
+from poutils import diff
+from poutils import mo
 
 #######################################################################
 # Basic constants
 #######################################################################
 version = "0.3"
 copyright = "Copyright © 2018 -2021 Osamu Aoki <osamu@debian.org>"
+# version part of the keys of the cached data (see cache.formats)
+cache_versions = {name: cache.version_key(version, name) for name in cache.formats}
+#######################################################################
+# gettext (msgcat/msguniq) compatible PO formatting
+#######################################################################
+page_width = 79  # same as the default of msgcat and msguniq
+
+# break is not allowed before/after these full width characters
+_no_break_before = set(
+    "、。，．・：；？！ー）」』】〉》〕"
+    "ぁぃぅぇぉっゃゅょゎァィゥェォッャュョヮヵヶ々"
+)
+_no_break_after = set("（「『【〈《〔")
+
+# a PO string is made of escape sequences and plain characters
+_re_unit = re.compile(r"\\.?|[^\\]", re.DOTALL)
+# portions of a PO string end after each \n
+_re_portion = re.compile(r"(?:[^\\]|\\[^n]|\\$)*(?:\\n)?", re.DOTALL)
+# break opportunities in an ASCII string (see _can_break)
+_ascii_break = (
+    r"(?:(?<= )(?=[^ ])|(?<=(?<!\\)[A-Za-z0-9]-)(?=[A-Za-z])|(?<=/)(?=[A-Za-z])|\Z)"
+)
+_re_ascii_lines = {}
+
+
+def _unit_width(u):
+    if len(u) > 1:
+        return len(u)  # escape sequence
+    elif u < "\u0300":
+        return 1
+    elif unicodedata.combining(u):
+        return 0
+    elif unicodedata.east_asian_width(u) in ("W", "F"):
+        return 2
+    else:
+        return 1
+
+
+def _str_width(s):
+    if s.isascii():
+        return len(s)
+    return sum(_unit_width(u) for u in s)
+
+
+def _can_break(units, i):
+    """
+    Allow a line break between units[i] and units[i + 1]
+    """
+    u = units[i]
+    v = units[i + 1]
+    if u == " ":
+        return v != " "
+    elif v == " ":
+        return False
+    elif u == "-":
+        return i > 0 and units[i - 1].isalnum() and v.isalpha()
+    elif u == "/":
+        return v.isalpha()
+    elif _unit_width(u) == 2 or _unit_width(v) == 2:
+        return v not in _no_break_before and u not in _no_break_after
+    return False
+
+
+def _chunks(portion):
+    """
+    Split a PO string portion into (text, width) chunks not to be broken
+    """
+    chunks = []
+    start = 0
+    units = _re_unit.findall(portion)
+    col = 0
+    for i, u in enumerate(units):
+        col += _unit_width(u)
+        if i + 1 < len(units) and _can_break(units, i):
+            chunks.append(("".join(units[start : i + 1]), col))
+            start = i + 1
+            col = 0
+    chunks.append(("".join(units[start:]), col))
+    return chunks
+
+
+def _break_portion(portion, width):
+    if _str_width(portion) <= width:
+        return [portion]
+    if portion.isascii():
+        re_lines = _re_ascii_lines.get(width)
+        if re_lines is None:
+            # the longest line ending at a break, or the shortest one if too long
+            re_lines = re.compile(
+                r".{{1,{0}}}{1}|.+?{1}".format(width, _ascii_break), re.DOTALL
+            )
+            _re_ascii_lines[width] = re_lines
+        return re_lines.findall(portion)
+    lines = []
+    line = ""
+    col = 0
+    for text, w in _chunks(portion):
+        if line and col + w > width:
+            lines.append(line)
+            line = text
+            col = w
+        else:
+            line += text
+            col += w
+    lines.append(line)
+    return lines
+
+
+def wrap_po_string(keyword, value, prefix="", wrap=True):
+    """
+    Format 'keyword "value"' as msgcat does: break lines after each \\n
+    and at page_width columns, starting with 'keyword ""' when it does not
+    fit in one line
+    """
+    head = prefix + keyword + ' "'
+    nl = value.find("\\n")
+    if (nl < 0 or nl == len(value) - 2) and (
+        not wrap or _str_width(head) + _str_width(value) + 1 <= page_width
+    ):
+        # fast path for the most common single line case
+        return [head + value + '"']
+    portions = [p for p in _re_portion.findall(value) if p] or [""]
+    if wrap:
+        width = page_width - _str_width(prefix) - 2
+        lines = []
+        for portion in portions:
+            lines.extend(_break_portion(portion, width))
+    else:
+        lines = portions
+    if len(lines) == 1 and (
+        not wrap or _str_width(head) + _str_width(lines[0]) + 1 <= page_width
+    ):
+        return [head + lines[0] + '"']
+    return [head + '"'] + [prefix + '"' + l + '"' for l in lines]
+
+
+def wrap_po_reference(refs):
+    """
+    Format references into '#:' lines as msgcat does
+    """
+    lines = []
+    line = "#:"
+    for r in refs:
+        if len(line) > 2 and len(line) + len(r) + 1 > page_width:
+            lines.append(line)
+            line = "#:"
+        line += " " + r
+    if len(line) > 2:
+        lines.append(line)
+    return lines
+
+
+# flags in the order msgcat writes them after "fuzzy"
+_format_flags = [
+    lang + "-format"
+    for lang in (
+        "c",
+        "objc",
+        "c++",
+        "python",
+        "python-brace",
+        "java",
+        "java-printf",
+        "csharp",
+        "javascript",
+        "scheme",
+        "lisp",
+        "elisp",
+        "librep",
+        "ruby",
+        "sh",
+        "awk",
+        "lua",
+        "object-pascal",
+        "smalltalk",
+        "qt",
+        "qt-plural",
+        "kde",
+        "kde-kuit",
+        "boost",
+        "tcl",
+        "perl",
+        "perl-brace",
+        "php",
+        "gcc-internal",
+        "gfc-internal",
+        "ycp",
+    )
+]
+_flag_order = {f: i for i, f in enumerate(_format_flags)}
+_flag_order.update({"no-" + f: i for i, f in enumerate(_format_flags)})
+_re_range = re.compile(r"^range:\s*(\d+)\.\.(\d+)$")
+
+
+def format_po_flags(lines, translated=True):
+    """
+    Merge '#,' lines into one as msgcat does (unknown flags are dropped)
+    """
+    fuzzy = False
+    flags = []
+    flag_range = None
+    wrap = None
+    for l in lines:
+        for f in l[2:].split(","):
+            f = f.strip()
+            if f == "fuzzy":
+                fuzzy = True
+            elif f in _flag_order:
+                if f not in flags:
+                    flags.append(f)
+            elif f in ("wrap", "no-wrap"):
+                wrap = f
+            elif _re_range.match(f):
+                flag_range = "range: {}..{}".format(*_re_range.match(f).groups())
+    flags.sort(key=lambda f: _flag_order[f])
+    if fuzzy and translated:
+        flags.insert(0, "fuzzy")
+    if flag_range:
+        flags.append(flag_range)
+    if wrap:
+        flags.append(wrap)
+    if flags:
+        return ["#, " + ", ".join(flags)]
+    else:
+        return []
+
+
+# parse_po_flags() results of the "#," lines seen (the same lines repeat)
+_flag_sets = {}
+_NO_FLAGS = frozenset()
+
+
+def _flag_words(l):
+    return [f for f in (f.strip() for f in l[2:].split(",")) if f]
+
+
+def parse_po_flags(l):
+    """
+    Return the frozenset of flags of a '#,' line split as format_po_flags()
+    """
+    flags = _flag_sets.get(l)
+    if flags is None:
+        flags = frozenset(_flag_words(l))
+        if len(_flag_sets) < 4096:
+            _flag_sets[l] = flags
+    return flags
+
+
+def parse_po_reference(l):
+    """
+    Return the list of (file, line) of a '#:' line (line is -1 if missing)
+    """
+    refs = []
+    for r in l[2:].split():
+        file, colon, line = r.rpartition(":")
+        if colon and line.isdigit():
+            refs.append((file, int(line)))
+        else:
+            refs.append((r, -1))
+    return refs
+
+
+def _format_comment(mark, l):
+    # msgcat reads "#. text" and "#.text" alike and writes "#. text"
+    text = l[len(mark) :]
+    if text[0:1] == " ":
+        text = text[1:]
+    if text:
+        return mark + " " + text
+    else:
+        return mark
+
+
+#######################################################################
+# Fast XML tag extraction for check_xml
+#######################################################################
+# characters not allowed in XML 1.0 documents
+_re_xml_ctrl = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _xml_tags(s):
+    """
+    Return the sorted tag names of "<xml>" + s + "</xml>" or None on error
+
+    Tags are collected from the expat tokenizer without building the tree
+    of ElementTree.  On error, parse with ElementTree for its message.
+    """
+    if "<" not in s and "&" not in s and "]]>" not in s:
+        return None if _re_xml_ctrl.search(s) else ["xml"]
+    tags = []
+    # same namespace handling as ET.XMLParser
+    parser = expat.ParserCreate(None, "}")
+    parser.StartElementHandler = lambda name, attrs: tags.append(name)
+    try:
+        parser.Parse("<xml>" + s + "</xml>", True)
+    except expat.ExpatError:
+        return None
+    for i, tag in enumerate(tags):
+        if "}" in tag:
+            tags[i] = "{" + tag
+    tags.sort()
+    return tags
+
+
 #######################################################################
 # Basic Class to handle POT/PO data
 #######################################################################
@@ -70,75 +383,376 @@ class Line(enum.Enum):
     OBSOLETE = enum.auto()
 
 
+# Empty list fields of all PotItems share this until a line is added
+_EMPTY = ()
+
+
 class PotItem:
+    """
+    PO entry
+
+    The list fields comment, extracted, reference, index, flag and
+    obsolete of a new PotItem are the shared empty tuple _EMPTY to save
+    memory, not lists.  Add lines by add_line() or assign a new list:
+    item.comment.append(line) raises AttributeError until a line is added.
+    """
+
+    __slots__ = (
+        "syncid",
+        "comment",
+        "extracted",
+        "reference",
+        "index",
+        "number_ref",
+        "flag",
+        "refs",
+        "pmsgid",
+        "msgctxt",
+        "msgid",
+        "msgstr",
+        "obsolete",
+    )
+
     def __init__(self):
         self.syncid = -1
-        self.comment = []
-        self.extracted = []
-        self.reference = []
-        self.index = []
+        self.comment = _EMPTY
+        self.extracted = _EMPTY
+        self.reference = _EMPTY
+        self.index = _EMPTY
         self.number_ref = 0
-        self.flag = []
+        self.flag = _EMPTY
+        self.refs = None  # (file, line) of the "#:" lines when parsed
         self.pmsgid = ""
         self.msgctxt = ""
         self.msgid = ""
         self.msgstr = ""
-        self.obsolete = []
+        self.obsolete = _EMPTY
 
     def reset(self):
         self.__init__()
 
-    refuz = re.compile(
-        r"(?P<head>^#,\s*(?:.*,\s*)?)(?P<fuzzy>fuzzy(?:,\s*)?)(?P<tail>.*$)"
-    )
+    def add_line(self, name, line):
+        """
+        Append line to the list field name, allocating the list on first use
+        """
+        lines = getattr(self, name)
+        if lines is _EMPTY:
+            setattr(self, name, [line])
+        else:
+            lines.append(line)
+        if name == "reference":
+            self.refs = None
+        return
+
+    def add_lines(self, name, lines):
+        for line in lines:
+            self.add_line(name, line)
+        return
+
+    def add_flag_line(self, line):
+        """
+        Append a '#,' line to flag
+        """
+        self.add_line("flag", line)
+        return
+
+    @property
+    def flags(self):
+        """
+        Frozenset of the flags of the '#,' lines in flag
+
+        Derived on each access, so it follows any change of flag.
+        """
+        flag = self.flag
+        if not flag:
+            return _NO_FLAGS
+        if len(flag) == 1:
+            return parse_po_flags(flag[0])
+        return _NO_FLAGS.union(*map(parse_po_flags, flag))
 
     def is_fuzzy(self):
-        flag = False
+        return "fuzzy" in self.flags
+
+    def rm_flag(self, flag):
+        """
+        Remove flag, rewriting only the '#,' lines with it
+        """
+        if flag not in self.flags:
+            return
+        lines = []
         for l in self.flag:
-            if self.refuz.search(l):
-                flag = True
-                break
-        return flag
+            if flag in parse_po_flags(l):
+                words = [f for f in _flag_words(l) if f != flag]
+                if words:
+                    lines.append(sys.intern("#, " + ", ".join(words)))
+            else:
+                lines.append(l)
+        self.flag = lines
+        return
 
     def rm_fuzzy(self):
-        for i, l in enumerate(self.flag):
-            if self.refuz.search(l):
-                self.flag[i] = self.refuz.sub(r"#, \g<head>\g<tail>", l)
-        n = len(self.flag)
-        for i in range(n):
-            j = n - 1 - i  # trim from tail side of list
-            if self.flag[j] == "#, ":
-                del self.flag[j]
+        self.rm_flag("fuzzy")
+        return
 
     def add_fuzzy(self):
         n = len(self.flag)
         if n == 0:
             self.flag = ["#, fuzzy"]
         elif not self.is_fuzzy():
-            print("n={}, flag[n-1]={}".format(n, self.flag[n - 1]))
-            self.flag[n - 1] = "#, fuzzy" + self.flag[n - 1][1:]
+            self.flag[n - 1] = sys.intern("#, fuzzy" + self.flag[n - 1][1:])
         return
 
-    reindex = re.compile(r"[^:]*:")
+    def references(self):
+        """
+        Return the tuple of (file, line) of the '#:' lines (parsed once)
+
+        add_line() drops it; set refs to None after changing reference
+        directly.
+        """
+        if self.refs is None:
+            self.refs = tuple(
+                ref
+                for l in self.reference
+                if l[0:2] == "#:"
+                for ref in parse_po_reference(l)
+            )
+        return self.refs
 
     def set_index(self):
-        # parse po4a-gettextize '#: ' lead reference lines
-        refs = []
-        for l in self.reference:
-            refs.extend(l[3:].split(" "))
-        if refs == []:
-            self.index.append(-1)
-        else:
-            for r in refs:
-                self.index.append(int(self.reindex.sub("", r)))
+        # line numbers of po4a-gettextize '#: ' lead reference lines
+        self.index = [line for file, line in self.references()] or [-1]
+        return
 
     def set_syncid(self, sid):
         self.syncid = sid
 
+    def raw_block(self):
+        """
+        Return raw PO text of this entry including the blank line after it
+        """
+        if len(self.obsolete) != 0:
+            return "\n".join(self.obsolete) + "\n\n"
+        if self.syncid >= 0:
+            sync = "{:0>8}\n".format(self.syncid)
+            block = (
+                "# SYNC1: " + sync,
+                "# SYNC2: " + sync,
+                "# SYNC3: " + sync,
+                "# SYNC4: " + sync,
+                "# SYNC5: " + sync,
+            )
+        else:
+            block = ()
+        lines = [*self.comment, *self.extracted, *self.reference, *self.flag]
+        if self.pmsgid != "":
+            lines.append('#| msgid "' + self.pmsgid + '"')
+        if self.msgctxt:
+            lines.append('msgctxt "' + self.msgctxt + '"')
+            lines.append('msgid "' + self.msgid + '"')
+            lines.append('msgstr "' + self.msgstr + '"')
+        elif self.msgid or self.msgstr:
+            # printing msgid and msgstr if both of them are not ""
+            lines.append('msgid "' + self.msgid + '"')
+            lines.append('msgstr "' + self.msgstr + '"')
+        lines.append("")
+        return "".join(block) + "\n".join(lines) + "\n"
+
+    re_escape = re.compile(r"(\{)(\+|-)|(-|\+)(\})")
+
+    def wdiff_msgid(self, mode="char", max_cost=diff.max_cost, cache=None):
+        if (
+            self.pmsgid != ""
+            and self.pmsgid[0:12] != "{++}{--}(++}"
+            and self.pmsgid[-12:] != "{++}{--}(++}"
+        ):
+            if cache is not None:
+                key = cache.key(
+                    cache_versions["wdiff"], mode, max_cost, self.pmsgid, self.msgid
+                )
+                pmsgid = cache.get(key)
+                if pmsgid is not None:
+                    self.pmsgid = pmsgid
+                    return
+            wdiff = ""
+            # Protect any occurrence of {+ +} {- -} by adding {++} in each of them
+            self.pmsgid = self.re_escape.sub(r"\g<1>\g<3>{++}\g<2>\g<4>", self.pmsgid)
+            for tag, i1, i2, j1, j2 in diff.opcodes(
+                self.pmsgid, self.msgid, mode=mode, max_cost=max_cost
+            ):
+                if tag == "equal":
+                    wdiff += self.pmsgid[i1:i2]
+                elif tag == "delete":
+                    wdiff += "{-" + self.pmsgid[i1:i2] + "-}"
+                elif tag == "insert":
+                    wdiff += "{+" + self.msgid[j1:j2] + "+}"
+                elif tag == "replace":
+                    wdiff += (
+                        "{-" + self.pmsgid[i1:i2] + "-}{+" + self.msgid[j1:j2] + "+}"
+                    )
+            # {++}{--}(++}"s placed around the wdiff string are NOP for change.
+            # These are used as the indicator for wdiff content.
+            self.pmsgid = "{++}{--}(++}" + wdiff + "{++}{--}(++}"
+            if cache is not None:
+                cache.put(key, self.pmsgid)
+        return
+
+    re_added = re.compile(r"(\{\+)(.*?)(\+\})")
+    re_deleted = re.compile(r"(\{-)(.*?)(-\})")
+
+    def previous_msgid(self):
+        if (
+            self.pmsgid != ""
+            and self.pmsgid[0:12] == "{++}{--}(++}"
+            and self.pmsgid[-12:] == "{++}{--}(++}"
+        ):
+            previous = self.pmsgid[12:-12]
+            previous = self.re_added.sub("", previous)  # Drop {+...+}
+            previous = self.re_deleted.sub(r"\g<2>", previous)  # Keep ... of  {-...-}
+            self.pmsgid = previous
+        return
+
+    def update_msgstr(self):
+        self.previous_msgid()
+        if self.pmsgid == self.msgstr:
+            self.msgstr = self.msgid
+            self.pmsgid = ""
+            self.rm_fuzzy()
+        return
+
+    reitstool = re.compile("<_:")
+
+    def xml_warnings(self, itstool=False):
+        """
+        Return warning comment lines for XML tags of msgid and msgstr
+
+        An empty list is returned when they match.
+        """
+        warnings = []
+        # trick to evaluate escape sequence: https://stackoverflow.com/questions/4020539/process-escape-sequences-in-a-string-in-python
+        msgid = codecs.escape_decode(bytes(self.msgid.strip(), "utf-8"))[0].decode(
+            "utf-8"
+        )
+        if itstool:
+            msgid = self.reitstool.sub("<", msgid)
+        # print("msgid={}".format(msgid))
+        msgstr = codecs.escape_decode(bytes(self.msgstr.strip(), "utf-8"))[0].decode(
+            "utf-8"
+        )
+        if itstool:
+            msgstr = self.reitstool.sub("<", msgstr)
+        # print("msgstr={}".format(msgstr))
+        if msgid and not self.msgctxt:
+            id_tags = _xml_tags(msgid)
+        else:
+            id_tags = []
+        if id_tags is None:
+            # make minimal XML from PO strings
+            xmsgid = (
+                '<?xml version="1.0" encoding="UTF-8"?>\n<xml>\n' + msgid + "\n</xml>"
+            )
+            try:
+                etid = ET.fromstring(xmsgid)
+            except ET.ParseError as err:
+                lineno, col = err.position
+                line = next(IT.islice(io.StringIO(xmsgid), lineno - 1, lineno))
+                warnings.append("# !!! WARN !!!: XML TAG parse error in msgid")
+                warnings.append("#       {}".format(err.msg))
+                warnings.append("#       {}".format(line.rstrip()))
+                warnings.append("#       {:=>{}}".format("^", col))
+                id_tags = []
+            else:
+                id_tags = [elem.tag for elem in etid.iter()]
+                id_tags.sort()
+        if msgid and msgstr and not self.msgctxt:
+            str_tags = _xml_tags(msgstr)
+        else:
+            str_tags = []
+        if str_tags is None:
+            xmsgstr = (
+                '<?xml version="1.0" encoding="UTF-8"?>\n<xml>\n' + msgstr + "\n</xml>"
+            )
+            try:
+                etstr = ET.fromstring(xmsgstr)
+            except ET.ParseError as err:
+                lineno, col = err.position
+                line = next(IT.islice(io.StringIO(xmsgstr), lineno - 1, lineno))
+                warnings.append("# !!! WARN !!!: XML TAG parse error in msgstr")
+                warnings.append("#       {}".format(err.msg))
+                warnings.append("#       {}".format(line.rstrip()))
+                warnings.append("#       {:=>{}}".format("^", col))
+                str_tags = []
+            else:
+                str_tags = [elem.tag for elem in etstr.iter()]
+                str_tags.sort()
+        if id_tags and str_tags:
+            if id_tags != str_tags:
+                warnings.append(
+                    "# !!! WARN !!!: XML TAG mismatch between msgid and msgstr"
+                )
+                warnings.append("#       msgid  = {}".format(",".join(id_tags)))
+                warnings.append("#       msgstr = {}".format(",".join(str_tags)))
+        return warnings
+
+
+def _xml_warnings_chunk(fields, itstool):
+    # run in a worker process of PotData.xml_warnings_all()
+    item = PotItem()
+    warnings = []
+    for item.msgctxt, item.msgid, item.msgstr in fields:
+        warnings.append(item.xml_warnings(itstool=itstool))
+    return warnings
+
+
+# runs of blank lines (as bytes.rstrip() of iter_po_bytes() sees them)
+_re_blank = re.compile(rb"\n(?:[ \t\r\f\v\x1c-\x1f]*\n)+")
+# the first byte which may not be a white space
+_re_text = re.compile(rb"[^ \t\n\r\f\v\x1c-\x1f]")
+
+
+def _is_blank(data, start, end):
+    m = _re_text.search(data, start, end)
+    if m is None:
+        return True
+    if data[m.start()] < 0x80:
+        return False
+    # non-ASCII white spaces are stripped as str by iter_po_bytes()
+    return not data[start:end].decode("utf-8", "replace").strip()
+
+
+def _read_po_part(path, start, end, type, lineno):
+    # run in a worker process of PotData.read_po_parallel()
+    parser = PotData()
+    with open(path, "rb") as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            items = list(
+                parser.iter_po_bytes(
+                    data, start=start, end=end, type=type, lineno=lineno
+                )
+            )
+    # columns are much faster to pickle than PotItems
+    return parser._to_columns(items) or items
+
+
+class PoParseError(ValueError):
+    """
+    PO syntax error with its line number (1 for the first line)
+    """
+
+    def __init__(self, lineno, line, type):
+        super().__init__("line {}: can not parse '{}' as {}".format(lineno, line, type))
+        self.lineno = lineno
+        self.line = line
+        self.type = type
+
+    def __reduce__(self):
+        # raised in worker processes of read_po_parallel()
+        return (PoParseError, (self.lineno, self.line, self.type))
+
 
 class PotData:
     def __init__(self):
         self.items = []
+        self.indexes = {}
         return
 
     def __getitem__(self, i):
@@ -152,9 +766,75 @@ class PotData:
 
     def append(self, item):
         self.items.append(item)
+        for name, index in self.indexes.items():
+            for key in self.index_keys[name](item):
+                index.setdefault(key, []).append(item)
         return
 
-    def read_po(self, file=sys.stdin, verbose=False):
+    # lazily built indexes: name -> function returning the keys of an item
+    index_keys = {
+        "msgid": lambda item: ((item.msgctxt, item.msgid),),
+        "msgstr": lambda item: (item.msgstr,),
+        "reference": lambda item: [
+            file if line < 0 else "{}:{}".format(file, line)
+            for file, line in item.references()
+        ],
+    }
+
+    def invalidate(self):
+        """
+        Drop the indexes to rebuild them on the next lookup
+
+        Call this after changing msgctxt, msgid, msgstr or reference of
+        items directly.  PotData methods which change them call this.
+        """
+        self.indexes = {}
+        return
+
+    def index(self, name):
+        """
+        Return the index name (see index_keys) mapping keys to item lists
+        """
+        index = self.indexes.get(name)
+        if index is None:
+            index = {}
+            keys = self.index_keys[name]
+            for item in self.items:
+                for key in keys(item):
+                    index.setdefault(key, []).append(item)
+            self.indexes[name] = index
+        return index
+
+    def find(self, msgid, msgctxt=""):
+        """
+        Return the first item with msgid and msgctxt or None
+        """
+        items = self.index("msgid").get((msgctxt, msgid))
+        return items[0] if items else None
+
+    def find_all(self, msgid=None, msgctxt="", msgstr=None):
+        """
+        Return the list of items with msgid and msgctxt and/or msgstr
+        """
+        if msgstr is None:
+            return list(self.index("msgid").get((msgctxt, msgid), ()))
+        items = self.index("msgstr").get(msgstr, ())
+        if msgid is None:
+            return list(items)
+        return [
+            item for item in items if item.msgid == msgid and item.msgctxt == msgctxt
+        ]
+
+    def by_reference(self, ref):
+        """
+        Return the list of items with the "#: " reference ref (file:line)
+        """
+        return list(self.index("reference").get(ref, ()))
+
+    def iter_po(self, file=sys.stdin, verbose=False):
+        """
+        Yield each PotItem as soon as its entry is completed by a blank line
+        """
         item = PotItem()
         j = 0  # line counter
         type = Line.INITIAL  # BEGIN OF FILE
@@ -165,18 +845,19 @@ class PotData:
                 # type = Line.BLANK
                 pass
             elif l == "" and type != Line.INITIAL:  # WHITE-SPACE
-                self.items.append(item)
+                yield item
                 item = PotItem()
                 type = Line.BLANK
             elif l[0:2] == "#.":  # EXTRACTED-COMMENTS
-                item.extracted.append(l)
+                # "#. type: Content of: <book>..." repeats all over a PO file
+                item.add_line("extracted", sys.intern(l))
                 type = Line.EXTRACTED
             elif l[0:2] == "#:":  # REFERENCE…
-                item.reference.append(l)
+                item.add_line("reference", l)
                 item.number_ref += len(l[3:].split(" "))
                 type = Line.REFERENCE
             elif l[0:2] == "#,":  # FLAG…
-                item.flag.append(l)
+                item.add_flag_line(sys.intern(l))
                 type = Line.FLAG
             elif l[0:10] == '#| msgid "':  # msgid PREVIOUS
                 item.pmsgid = l[10:-1]
@@ -185,13 +866,13 @@ class PotData:
                 item.pmsgid += l[4:-1]
                 # type = Line.PMSGID
             elif l[0:2] == "#~" and type == Line.BLANK:  # OBSOLETE
-                item.obsolete.append(l)
+                item.add_line("obsolete", l)
                 type = Line.OBSOLETE
             elif l[0:2] == "#~" and type == Line.OBSOLETE:  # OBSOLETE
-                item.obsolete.append(l)
+                item.add_line("obsolete", l)
                 # type = Line.OBSOLETE
             elif l[0:1] == "#":  # TRANSLATOR-COMMENT
-                item.comment.append(l)
+                item.add_line("comment", l)
                 type = Line.COMMENT
             elif l[0:9] == 'msgctxt "':  # msgctxt STRING
                 item.msgctxt = l[9:-1]
@@ -215,9 +896,287 @@ class PotData:
                 print("I {}: {} '{}'".format(j, type, l))
             j += 1
         if type != Line.BLANK:
-            self.items.append(item)
+            yield item
+        return
+
+    def read_po(self, file=sys.stdin, verbose=False):
+        self.invalidate()
+        self.items.extend(self.iter_po(file=file, verbose=verbose))
+        return
+
+    # iter_po_bytes() dispatch table keyed on the first 2 (or 1) bytes
+    _ops = {
+        b"": "blank",
+        b"#.": "extracted",
+        b"#:": "reference",
+        b"#,": "flag",
+        b"#|": "previous",
+        b"#~": "obsolete",
+        b"#": "comment",
+        b"ms": "keyword",
+        b'"': "string",
+    }
+
+    def iter_po_bytes(
+        self, data, start=0, end=None, type=Line.INITIAL, lineno=0, verbose=False
+    ):
+        """
+        Yield each PotItem parsed from bytes or mmap data
+
+        This is an alternative engine of iter_po() which reads lines as
+        bytes, dispatches them by the _ops table, collects continued
+        strings and decodes them once joined.
+        Parsing of data[start:end] starts with line number lineno (counted
+        from 0) in type state.  Leading blank lines are skipped and an
+        illegal line raises PoParseError.
+        """
+        if end is None:
+            end = len(data)
+        if not isinstance(data, mmap.mmap):
+            data = io.BytesIO(data)
+        data.seek(start)
+        readline = data.readline
+        ops = self._ops
+        # local names are faster than Line.* lookups in this loop
+        INITIAL = Line.INITIAL
+        COMMENT = Line.COMMENT
+        EXTRACTED = Line.EXTRACTED
+        REFERENCE = Line.REFERENCE
+        FLAG = Line.FLAG
+        PMSGID = Line.PMSGID
+        MSGCTXT = Line.MSGCTXT
+        MSGID = Line.MSGID
+        MSGSTR = Line.MSGSTR
+        BLANK = Line.BLANK
+        OBSOLETE = Line.OBSOLETE
+        item = PotItem()
+        field = None  # string field continued by the following lines
+        field_j = 0
+        parts = []
+        pos = start
+        j = lineno
+        try:
+            while pos < end:
+                l = readline()
+                pos += len(l)
+                l = l.rstrip()  # tailing whitespaces (SP, CR. LF)
+                if l and (l[-1] > 127 or 28 <= l[-1] <= 31):
+                    # str.rstrip() of iter_po() strips non-ASCII white spaces, too
+                    l = l.decode("utf-8").rstrip().encode("utf-8")
+                op = ops.get(l[0:2]) or ops.get(l[0:1])
+                if op == "string" and (type == MSGID or type == MSGSTR):
+                    parts.append(l[1:-1])
+                    # type = MSGID or MSGSTR
+                elif op == "previous" and type == PMSGID and l[0:4] == b'#| "':
+                    parts.append(l[4:-1])
+                    # type = PMSGID
+                else:
+                    if field is not None:
+                        setattr(item, field, b"".join(parts).decode("utf-8"))
+                        field = None
+                    if op == "blank":
+                        if type != BLANK and type != INITIAL:
+                            yield item
+                            item = PotItem()
+                            type = BLANK
+                    elif op == "extracted":
+                        item.add_line("extracted", sys.intern(l.decode("utf-8")))
+                        type = EXTRACTED
+                    elif op == "reference":
+                        item.add_line("reference", l.decode("utf-8"))
+                        item.number_ref += len(l[3:].split(b" "))
+                        type = REFERENCE
+                    elif op == "flag":
+                        item.add_flag_line(sys.intern(l.decode("utf-8")))
+                        type = FLAG
+                    elif op == "previous" and l[0:10] == b'#| msgid "':
+                        field = "pmsgid"
+                        field_j = j
+                        parts = [l[10:-1]]
+                        type = PMSGID
+                    elif op == "obsolete" and (type == BLANK or type == OBSOLETE):
+                        item.add_line("obsolete", l.decode("utf-8"))
+                        type = OBSOLETE
+                    elif op == "comment" or op == "previous" or op == "obsolete":
+                        item.add_line("comment", l.decode("utf-8"))
+                        type = COMMENT
+                    elif op == "keyword" and l[0:9] == b'msgctxt "':
+                        field = "msgctxt"
+                        field_j = j
+                        parts = [l[9:-1]]
+                        type = MSGCTXT
+                    elif op == "keyword" and l[0:7] == b'msgid "':
+                        field = "msgid"
+                        field_j = j
+                        parts = [l[7:-1]]
+                        type = MSGID
+                    elif op == "keyword" and l[0:8] == b'msgstr "':
+                        field = "msgstr"
+                        field_j = j
+                        parts = [l[8:-1]]
+                        type = MSGSTR
+                    else:  # ILLEGAL
+                        line = l.decode("utf-8", "replace")
+                        raise PoParseError(j + 1, line, type)
+                if verbose:
+                    print("I {}: {} '{}'".format(j, type, l.decode("utf-8")))
+                j += 1
+            if field is not None:
+                setattr(item, field, b"".join(parts).decode("utf-8"))
+        except UnicodeDecodeError as err:
+            if field is not None:
+                j = field_j
+            raise PoParseError(j + 1, "UTF-8 " + err.reason, type) from err
+        if type != BLANK:
+            yield item
+        return
+
+    def iter_po_mmap(self, file, verbose=False):
+        """
+        Yield each PotItem of a PO file memory-mapped via iter_po_bytes()
+        """
+        if os.fstat(file.fileno()).st_size == 0:
+            yield from self.iter_po_bytes(b"", verbose=verbose)
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from self.iter_po_bytes(data, verbose=verbose)
+        return
+
+    def read_po_mmap(self, file, verbose=False):
+        self.invalidate()
+        self.items.extend(self.iter_po_mmap(file, verbose=verbose))
         return
 
+    def iter_po_spans(self, data, size=0):
+        """
+        Yield (start, end, type, lineno) of the parts of bytes or mmap data
+        for iter_po_bytes() to parse them into the same PotItems as data
+
+        data is split at blank lines after at least size bytes of each
+        part.  The only state kept over blank lines is whether a line
+        was parsed before (type Line.BLANK) or not (Line.INITIAL), e.g.,
+        "#~" lines are obsolete only after an entry.  Parts of blank
+        lines are skipped unless data has nothing else.
+        """
+        initial = True
+        lineno = 0
+        pos = 0  # lines are counted up to pos
+        start = 0
+        while True:
+            m = None
+            if start + size < len(data):
+                m = _re_blank.search(data, start + size)
+            end = len(data) if m is None else m.start()
+            if not _is_blank(data, start, end):
+                lineno += data[pos:start].count(b"\n")  # mmap has no count()
+                pos = start
+                yield (start, end, Line.INITIAL if initial else Line.BLANK, lineno)
+                initial = False
+            if m is None:
+                break
+            start = m.end()
+        if initial:
+            yield (0, len(data), Line.INITIAL, 0)
+        return
+
+    def read_po_parallel(self, path, jobs=None, chunk=1 << 20):
+        """
+        Read PO file path by parsing its parts in up to jobs processes
+
+        The file is split by iter_po_spans() into about 4 parts per
+        process of at least chunk bytes.  The PotItems are the same as
+        read_po_mmap() makes.  A small file is read by read_po_mmap().
+        """
+        if jobs is None:
+            jobs = os.cpu_count()
+        if jobs <= 1 or os.path.getsize(path) < 2 * chunk:
+            with open(path, "rb") as fp:
+                self.read_po_mmap(fp)
+            return
+        self.invalidate()
+        with open(path, "rb") as fp:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                size = max(chunk, len(data) // (4 * jobs))
+                spans = list(self.iter_po_spans(data, size=size))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_read_po_part, path, *span) for span in spans]
+            # in order, so that the first PoParseError of the file is raised
+            for future in futures:
+                result = future.result()
+                if isinstance(result, list):
+                    self.items.extend(result)  # a string has NUL
+                else:
+                    self.items.extend(self._from_columns(result))
+        return
+
+    # PotItem fields kept by the parse cache (others are set later)
+    _text_fields = ("pmsgid", "msgctxt", "msgid", "msgstr")
+    _line_fields = ("comment", "extracted", "reference", "flag", "obsolete")
+
+    def read_po_cached(self, path, verbose=False):
+        """
+        Read PO file path via its sidecar parse cache
+
+        The sidecar file (see cache.sidecar_path()) is used if it was made
+        by this version for the same size, mtime and content hash of path.
+        Otherwise path is parsed by iter_po() and the sidecar file is
+        rewritten.  verbose always parses.
+        """
+        self.invalidate()
+        data, stamp = cache.read_sidecar(path, cache_versions["parse"])
+        if data is not None and not verbose:
+            self.items.extend(self._from_columns(data))
+            return
+        with open(path, "r") as fp:
+            items = list(self.iter_po(file=fp, verbose=verbose))
+        data = self._to_columns(items)
+        if data is not None:
+            cache.write_sidecar(path, stamp, data)
+        self.items.extend(items)
+        return
+
+    def _to_columns(self, items):
+        """
+        Return items as marshal-able columns, or None if a string has NUL
+
+        Each string field is joined by NUL into one string and each line
+        field is a dict of the item numbers with lines.
+        """
+        text = []
+        for field in self._text_fields:
+            column = "\0".join([getattr(item, field) for item in items])
+            if column.count("\0") != max(len(items) - 1, 0):
+                return None
+            text.append(column)
+        lines = []
+        for field in self._line_fields:
+            lines.append(
+                {
+                    n: getattr(item, field)
+                    for n, item in enumerate(items)
+                    if getattr(item, field)
+                }
+            )
+        return (text, lines, [item.number_ref for item in items])
+
+    def _from_columns(self, data):
+        text, lines, number_ref = data
+        items = []
+        for pmsgid, msgctxt, msgid, msgstr, n in zip(
+            *[column.split("\0") for column in text], number_ref
+        ):
+            item = PotItem()
+            item.pmsgid = pmsgid
+            item.msgctxt = msgctxt
+            item.msgid = msgid
+            item.msgstr = msgstr
+            item.number_ref = n
+            items.append(item)
+        for field, column in zip(self._line_fields, lines):
+            for n, value in column.items():
+                setattr(items[n], field, value)
+        return items
+
     def set_all_index(self):
         for item in self.items:
             item.set_index()
@@ -227,52 +1186,271 @@ class PotData:
             item.set_syncid(sid)
 
     def output_raw(self, file=sys.stdout):
-        for item in self.items:
-            if len(item.obsolete) == 0:
-                if item.syncid >= 0:
-                    print("# SYNC1: {:0>8}".format(item.syncid), file=file)
-                    print("# SYNC2: {:0>8}".format(item.syncid), file=file)
-                    print("# SYNC3: {:0>8}".format(item.syncid), file=file)
-                    print("# SYNC4: {:0>8}".format(item.syncid), file=file)
-                    print("# SYNC5: {:0>8}".format(item.syncid), file=file)
-                for l in item.comment:
-                    print(l, file=file)
-                for l in item.extracted:
-                    print(l, file=file)
-                for l in item.reference:
-                    print(l, file=file)
-                for l in item.flag:
-                    print(l, file=file)
-                if item.pmsgid != "":
-                    print('#| msgid "' + item.pmsgid + '"', file=file)
-                if item.msgctxt:
-                    print('msgctxt "' + item.msgctxt + '"', file=file)
-                    print('msgid "' + item.msgid + '"', file=file)
-                    print('msgstr "' + item.msgstr + '"', file=file)
-                elif item.msgid or item.msgstr:
-                    # printing msgid and msgstr if both of them are not ""
-                    print('msgid "' + item.msgid + '"', file=file)
-                    print('msgstr "' + item.msgstr + '"', file=file)
-            else:
-                for l in item.obsolete:
-                    print(l, file=file)
-            print("", file=file)
+        self.write_raw(self.items, file=file)
+        return
+
+    def write_raw(self, items, file=sys.stdout, batch=1024):
+        """
+        Write PotItems from any iterable without keeping them
+
+        Each entry is formatted once by PotItem.raw_block() and handed to
+        the file in batches of entries.
+        """
+        blocks = []
+        for item in items:
+            blocks.append(item.raw_block())
+            if len(blocks) >= batch:
+                file.writelines(blocks)
+                blocks = []
+        file.writelines(blocks)
+        return
+
+    def output_raw_bytes(self, file=None, bufsize=1 << 20):
+        self.write_raw_bytes(self.items, file=file, bufsize=bufsize)
         return
 
-    def output_po(self, file=sys.stdout, raw=False):
+    def write_raw_bytes(self, items, file=None, bufsize=1 << 20):
+        """
+        Write PotItems as UTF-8 to a binary file through a preallocated buffer
+        """
+        if file is None:
+            file = sys.stdout.buffer
+        buf = bytearray(bufsize)
+        view = memoryview(buf)
+        pos = 0
+        for item in items:
+            data = item.raw_block().encode("utf-8")
+            n = len(data)
+            if pos + n > bufsize:
+                file.write(view[:pos])
+                pos = 0
+                if n > bufsize:
+                    file.write(data)
+                    continue
+            view[pos : pos + n] = data
+            pos += n
+        file.write(view[:pos])
+        view.release()
+        return
+
+    def output_po(self, file=sys.stdout, raw=False, msguniq=False, formatted=None):
+        self.write_po(
+            self.items, file=file, raw=raw, msguniq=msguniq, formatted=formatted
+        )
+        return
+
+    def write_mo(self, file, use_fuzzy=False):
+        """
+        Write the items to binary file as a GNU MO file as "msgfmt" does
+
+        Untranslated and obsolete entries are skipped and so are fuzzy
+        ones unless use_fuzzy (the header is kept even if fuzzy).  The
+        first one of duplicates is used.  Strings are UTF-8.  The number of
+        entries written is returned.
+        """
+
+        def unescape(s):
+            return codecs.escape_decode(bytes(s, "utf-8"))[0]
+
+        pairs = {}
+        for item in self.items:
+            if item.msgstr == "" or len(item.obsolete) != 0:
+                continue
+            if item.msgid != "" and not use_fuzzy and item.is_fuzzy():
+                continue
+            key = unescape(item.msgid)
+            if item.msgctxt != "":
+                key = unescape(item.msgctxt) + b"\x04" + key
+            pairs.setdefault(key, unescape(item.msgstr))
+        mo.write(file, pairs.items())
+        return len(pairs)
+
+    def write_po(
+        self, items, file=sys.stdout, raw=False, msguniq=False, formatted=None
+    ):
+        """
+        Write PotItems from any iterable
+
+        Unless raw, duplicates are removed and lines are wrapped as
+        "msguniq --use-first" does, by write_uniq() or by msguniq itself.
+        """
         if raw:
-            self.output_raw(file=file)
+            self.write_raw(items, file=file)
+        elif not msguniq:
+            self.write_uniq(items, file=file, formatted=formatted)
         else:
-            with tempfile.TemporaryFile(mode="w+", encoding="utf-8") as ftmp:
-                self.output_raw(file=ftmp)
-                ftmp.seek(0)
-                subprocess.run(
-                    ["msguniq", "--use-first", "-"],
-                    stdin=ftmp,
-                    stdout=file,
-                    stderr=sys.stderr,
-                    encoding="utf-8",
-                )
+            # feed msguniq through a pipe instead of a temporary file
+            file.flush()
+            with subprocess.Popen(
+                ["msguniq", "--use-first", "-"],
+                stdin=subprocess.PIPE,
+                stdout=file,
+                stderr=sys.stderr,
+                encoding="utf-8",
+            ) as proc:
+                self.write_raw(items, file=proc.stdin)
+        return
+
+    def write_uniq(self, items, file=sys.stdout, formatted=None):
+        """
+        Write PotItems as "msguniq --use-first" does in a single pass
+
+        The first entry of each (msgctxt, msgid) is kept.  Unlike msguniq,
+        references of the later duplicates are not merged into it.
+        Obsolete entries are moved to the end.
+        A dict formatted keeps the text of each entry written to reuse it
+        for the same (unchanged) PotItem next time (see poutils.watch).
+        """
+        used = {}
+        seen = set()
+        obsolete = []
+        pending = []
+        first = True
+        for item in items:
+            if len(item.obsolete) != 0:
+                obsolete.append(item.obsolete)
+                continue
+            lines = pending
+            if item.syncid >= 0:
+                for n in range(1, 6):
+                    lines.append("# SYNC{}: {:0>8}".format(n, item.syncid))
+            lines.extend(item.comment)
+            lines.extend(item.extracted)
+            lines.extend(item.reference)
+            lines.extend(item.flag)
+            if not (item.msgctxt or item.msgid or item.msgstr):
+                # msguniq attaches comments without message to the next one
+                pending = lines
+                continue
+            pending = []
+            key = (item.msgctxt, item.msgid)
+            if key in seen:
+                continue
+            seen.add(key)
+            if not first:
+                file.write("\n")
+            if formatted is None:
+                text = "\n".join(self.format_item(item, lines))
+            else:
+                key = (item, tuple(lines))
+                text = formatted.get(key)
+                if text is None:
+                    text = "\n".join(self.format_item(item, lines))
+                used[key] = text
+            file.write(text + "\n")
+            first = False
+        for lines in obsolete:
+            if not first:
+                file.write("\n")
+            file.write("\n".join(lines) + "\n")
+            first = False
+        if formatted is not None:
+            formatted.clear()
+            formatted.update(used)
+        return
+
+    def format_item(self, item, lines):
+        """
+        Format a PotItem with its comment lines as msgcat does
+        """
+        comment = []
+        extracted = []
+        refs = []
+        flags = []
+        previous = []
+        for l in lines:
+            if l[0:2] == "#.":
+                extracted.append(_format_comment("#.", l))
+            elif l[0:2] == "#:":
+                for r in l[2:].split():
+                    if r not in refs:
+                        refs.append(r)
+            elif l[0:2] == "#,":
+                flags.append(l)
+            elif l[0:2] == "#|":
+                previous.append(l)
+            else:
+                comment.append(_format_comment("#", l))
+        flags = format_po_flags(flags, translated=(item.msgstr != ""))
+        wrap = not (flags and "no-wrap" in flags[0][3:].split(", "))
+        out = comment + extracted + wrap_po_reference(refs) + flags + previous
+        if item.pmsgid != "":
+            out.extend(wrap_po_string("msgid", item.pmsgid, prefix="#| ", wrap=wrap))
+        if item.msgctxt:
+            out.extend(wrap_po_string("msgctxt", item.msgctxt, wrap=wrap))
+        out.extend(wrap_po_string("msgid", item.msgid, wrap=wrap))
+        out.extend(wrap_po_string("msgstr", item.msgstr, wrap=wrap))
+        return out
+
+    def stream_po(
+        self, file_in, file_out, transform, raw=False, msguniq=False, items=None
+    ):
+        """
+        Read, transform and write PO entries one at a time
+
+        transform is called with each PotItem, e.g., PotItem.rm_fuzzy.
+        items already read from file_in (e.g., by read_po_cached()) are
+        used instead of parsing it.
+        """
+
+        def apply(items):
+            for item in items:
+                transform(item)
+                yield item
+
+        if items is None:
+            items = self.iter_po(file=file_in)
+        self.write_po(apply(items), file=file_out, raw=raw, msguniq=msguniq)
+        return
+
+    def stream_po_inplace(
+        self, path, transform, keep=False, raw=False, msguniq=False, items=None
+    ):
+        """
+        Rewrite PO file through transform (keep original as *.orig)
+        """
+
+        def write(fp_in, fp_out):
+            self.stream_po(
+                fp_in, fp_out, transform, raw=raw, msguniq=msguniq, items=items
+            )
+
+        self.rewrite_po(path, write, keep=keep)
+        return
+
+    def output_po_inplace(self, path, keep=False, raw=False, msguniq=False):
+        """
+        Replace PO file with the items (keep original as *.orig)
+        """
+
+        def write(fp_in, fp_out):
+            self.output_po(file=fp_out, raw=raw, msguniq=msguniq)
+
+        self.rewrite_po(path, write, keep=keep)
+        return
+
+    def rewrite_po(self, path, write, keep=False):
+        """
+        Replace PO file atomically with what write(fp_in, fp_out) writes
+
+        PO file is left as it is if write() fails.  It is copied to *.orig
+        only after the new one is written.
+        """
+        with open(path, "r") as fp_in, tempfile.NamedTemporaryFile(
+            mode="w",
+            dir=os.path.dirname(path) or ".",
+            prefix=os.path.basename(path) + ".",
+            delete=False,
+        ) as fp_out:
+            try:
+                write(fp_in, fp_out)
+            except BaseException:
+                os.unlink(fp_out.name)
+                raise
+        shutil.copymode(path, fp_out.name)
+        if keep:
+            shutil.copy2(path, path + ".orig")
+        os.replace(fp_out.name, path)
         return
 
     def rm_fuzzy_all(self):
@@ -289,6 +1467,7 @@ class PotData:
         """
         Clean msgstr if msgid is the same except for pattern matches
         """
+        self.invalidate()
         if pattern_extracted:
             re_pattern_extracted = re.compile(pattern_extracted)
         if pattern_msgid:
@@ -313,88 +1492,70 @@ class PotData:
                 pass
         return
 
-    def check_xml(self, force_check=False, itstool=False):
+    def check_xml(
+        self, force_check=False, itstool=False, cache=None, jobs=1, warned=None
+    ):
         """
         check matching xml tags between msgid and msgstr in a merged PO file.
+
+        When cache (a poutils.cache.Cache) is given, warnings of unchanged
+        entries are looked up there instead of parsing them again.  With
+        jobs > 1, the other entries are checked in contiguous chunks by a
+        process pool.  The items with warnings are appended to the list
+        warned if it is given.
+
+        Return the number of entries with warnings.
         """
-        reitstool = re.compile("<_:")
-        for item in self.items:
-            if not item.is_fuzzy() or force_check:
-                # trick to evaluate escape sequence: https://stackoverflow.com/questions/4020539/process-escape-sequences-in-a-string-in-python
-                msgid = codecs.escape_decode(bytes(item.msgid.strip(), "utf-8"))[
-                    0
-                ].decode("utf-8")
-                if itstool:
-                    msgid = reitstool.sub("<", msgid)
-                # print("msgid={}".format(msgid))
-                msgstr = codecs.escape_decode(bytes(item.msgstr.strip(), "utf-8"))[
-                    0
-                ].decode("utf-8")
-                if itstool:
-                    msgstr = reitstool.sub("<", msgstr)
-                # print("msgstr={}".format(msgstr))
-                # make minimal XML from PO strings
-                xmsgid = (
-                    '<?xml version="1.0" encoding="UTF-8"?>\n<xml>\n'
-                    + msgid
-                    + "\n</xml>"
-                )
-                xmsgstr = (
-                    '<?xml version="1.0" encoding="UTF-8"?>\n<xml>\n'
-                    + msgstr
-                    + "\n</xml>"
+        num_warn = 0
+        items = [item for item in self.items if not item.is_fuzzy() or force_check]
+        if cache is None:
+            todo = items
+        else:
+            keys = [
+                cache.key(
+                    cache_versions["check"],
+                    itstool,
+                    item.msgctxt,
+                    item.msgid,
+                    item.msgstr,
                 )
-                if msgid and not item.msgctxt:
-                    try:
-                        etid = ET.fromstring(xmsgid)
-                    except ET.ParseError as err:
-                        lineno, col = err.position
-                        line = next(IT.islice(io.StringIO(xmsgid), lineno - 1, lineno))
-                        item.comment.append(
-                            "# !!! WARN !!!: XML TAG parse error in msgid"
-                        )
-                        item.comment.append("#       {}".format(err.msg))
-                        item.comment.append("#       {}".format(line.rstrip()))
-                        item.comment.append("#       {:=>{}}".format("^", col))
-                        item.add_fuzzy()
-                        id_tags = []
-                    else:
-                        id_tags = [elem.tag for elem in etid.iter()]
-                        id_tags.sort()
-                else:
-                    id_tags = []
-                if msgid and msgstr and not item.msgctxt:
-                    try:
-                        etstr = ET.fromstring(xmsgstr)
-                    except ET.ParseError as err:
-                        lineno, col = err.position
-                        line = next(IT.islice(io.StringIO(xmsgstr), lineno - 1, lineno))
-                        item.comment.append(
-                            "# !!! WARN !!!: XML TAG parse error in msgstr"
-                        )
-                        item.comment.append("#       {}".format(err.msg))
-                        item.comment.append("#       {}".format(line.rstrip()))
-                        item.comment.append("#       {:=>{}}".format("^", col))
-                        item.add_fuzzy()
-                        str_tags = []
-                    else:
-                        str_tags = [elem.tag for elem in etstr.iter()]
-                        str_tags.sort()
-                else:
-                    str_tags = []
-                if id_tags and str_tags:
-                    if id_tags != str_tags:
-                        item.comment.append(
-                            "# !!! WARN !!!: XML TAG mismatch between msgid and msgstr"
-                        )
-                        item.comment.append(
-                            "#       msgid  = {}".format(",".join(id_tags))
-                        )
-                        item.comment.append(
-                            "#       msgstr = {}".format(",".join(str_tags))
-                        )
-                        item.add_fuzzy()
-        return
+                for item in items
+            ]
+            found = cache.get_many(keys)
+            todo = [item for i, item in enumerate(items) if keys[i] not in found]
+        results = iter(self.xml_warnings_all(todo, itstool=itstool, jobs=jobs))
+        for i, item in enumerate(items):
+            if cache is None:
+                warnings = next(results)
+            else:
+                warnings = found.get(keys[i])
+                if warnings is None:
+                    warnings = next(results)
+                    cache.put(keys[i], warnings)
+            if warnings:
+                item.add_lines("comment", warnings)
+                item.add_fuzzy()
+                num_warn += 1
+                if warned is not None:
+                    warned.append(item)
+        return num_warn
+
+    def xml_warnings_all(self, items, itstool=False, jobs=1, chunk=2000):
+        """
+        Return the list of item.xml_warnings() for items (in up to jobs processes)
+        """
+        if jobs <= 1 or len(items) <= chunk:
+            return [item.xml_warnings(itstool=itstool) for item in items]
+        # workers get only the strings and return only the warnings
+        fields = [(item.msgctxt, item.msgid, item.msgstr) for item in items]
+        chunks = [fields[i : i + chunk] for i in range(0, len(fields), chunk)]
+        warnings = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            for result in pool.map(
+                _xml_warnings_chunk, chunks, IT.repeat(itstool, len(chunks))
+            ):
+                warnings.extend(result)
+        return warnings
 
     def dup_msgstr(self, pattern_extracted=None, pattern_msgid=None, rm_fuzzy=True):
         """
@@ -402,6 +1563,7 @@ class PotData:
         """
         # No pre-made command provided.
         # Call from your custom command to add duplicate msgstr to matched items
+        self.invalidate()
         if pattern_extracted:
             re_pattern_extracted = re.compile(pattern_extracted)
         if pattern_msgid:
@@ -421,60 +1583,20 @@ class PotData:
                 pass
         return
 
-    def wdiff_msgid(self):
-        re_escape = re.compile(r"(\{)(\+|-)|(-|\+)(\})")
+    def wdiff_msgid(self, mode="char", max_cost=diff.max_cost, cache=None):
         for item in self.items:
-            if (
-                item.pmsgid != ""
-                and item.pmsgid[0:12] != "{++}{--}(++}"
-                and item.pmsgid[-12:] != "{++}{--}(++}"
-            ):
-                wdiff = ""
-                # Protect any occurrence of {+ +} {- -} by adding {++} in each of them
-                item.pmsgid = re_escape.sub(r"\g<1>\g<3>{++}\g<2>\g<4>", item.pmsgid)
-                diff = difflib.SequenceMatcher(isjunk=None, a=item.pmsgid, b=item.msgid)
-                for tag, i1, i2, j1, j2 in diff.get_opcodes():
-                    if tag == "equal":
-                        wdiff += item.pmsgid[i1:i2]
-                    elif tag == "delete":
-                        wdiff += "{-" + item.pmsgid[i1:i2] + "-}"
-                    elif tag == "insert":
-                        wdiff += "{+" + item.msgid[j1:j2] + "+}"
-                    elif tag == "replace":
-                        wdiff += (
-                            "{-"
-                            + item.pmsgid[i1:i2]
-                            + "-}{+"
-                            + item.msgid[j1:j2]
-                            + "+}"
-                        )
-                # {++}{--}(++}"s placed around the wdiff string are NOP for change.
-                # These are used as the indicator for wdiff content.
-                item.pmsgid = "{++}{--}(++}" + wdiff + "{++}{--}(++}"
+            item.wdiff_msgid(mode=mode, max_cost=max_cost, cache=cache)
         return
 
     def previous_msgid(self):
-        re_added = re.compile(r"(\{\+)(.*?)(\+\})")
-        re_deleted = re.compile(r"(\{-)(.*?)(-\})")
         for item in self.items:
-            if (
-                item.pmsgid != ""
-                and item.pmsgid[0:12] == "{++}{--}(++}"
-                and item.pmsgid[-12:] == "{++}{--}(++}"
-            ):
-                previous = item.pmsgid[12:-12]
-                previous = re_added.sub("", previous)  # Drop {+...+}
-                previous = re_deleted.sub(r"\g<2>", previous)  # Keep ... of  {-...-}
-                item.pmsgid = previous
+            item.previous_msgid()
         return
 
     def update_msgstr(self):
-        self.previous_msgid()
+        self.invalidate()
         for item in self.items:
-            if item.pmsgid == item.msgstr:
-                item.msgstr = item.msgid
-                item.pmsgid = ""
-                item.rm_fuzzy()
+            item.update_msgstr()
 
     def normalize(
         self,
@@ -485,17 +1607,19 @@ class PotData:
         drop_pmsgid=True,
         drop_obsolete=True,
     ):
+        self.invalidate()
         for item in self.items:
             if drop_comment:
-                item.comment = []
+                item.comment = _EMPTY
             if drop_reference:
-                item.reference = []
+                item.reference = _EMPTY
+                item.refs = None
             if drop_flag:
-                item.flag = []
+                item.flag = _EMPTY
             if drop_pmsgid:
                 item.pmsgid = ""
             if drop_obsolete:
-                item.obsolete = []
+                item.obsolete = _EMPTY
             if len(item.extracted) > 1:
                 print(
                     "len(extracted)={} for msgid={}".format(
@@ -531,7 +1655,16 @@ class PotData:
         )
         return
 
-    def combine_pots(self, translation):
+    def combine_pots(self, translation, align=False, cache=None):
+        """
+        Set msgstr from msgid of translation paired by position (or by
+        alignment with combine_aligned if align is True)
+
+        cache is passed to combine_aligned.
+        """
+        if align:
+            return self.combine_aligned(translation, cache=cache)
+        self.invalidate()
         if len(self.items) > len(translation.items):
             print(
                 """\
@@ -579,16 +1712,19 @@ E: *** master: {} < translation: {} ***
                 # normal part
                 if item.number_ref != translation.items[j].number_ref:
                     num_warn_ref += 1
-                    item.reference.append(
+                    item.add_line(
+                        "reference",
                         "# WARN: mismatched references: {} --> {}".format(
                             item.number_ref, translation.items[j].number_ref
-                        )
+                        ),
                     )
-                    item.reference.extend(translation.items[j].reference)
+                    item.add_lines("reference", translation.items[j].reference)
                 if item.extracted[0] != translation.items[j].extracted[0]:
                     num_warn_extracted += 1
-                    item.extracted.append("# WARN: mismatched extracted tag pattern")
-                    item.extracted.extend(translation.items[j].extracted)
+                    item.add_line(
+                        "extracted", "# WARN: mismatched extracted tag pattern"
+                    )
+                    item.add_lines("extracted", translation.items[j].extracted)
                 item.msgstr = translation.items[j].msgid
                 j += 1
         if num_warn_extracted > 0:
@@ -599,6 +1735,98 @@ E: *** master: {} < translation: {} ***
             print("W: *** mismatched references: {}".format(num_warn_ref))
         return
 
+    def align_pots(self, translation, k=4, band=100, cache=None):
+        """
+        Align normalized POT data by the extracted tag pattern and number_ref
+
+        Return a list of (item, translation_item) pairs in order with None
+        for the side of an unmatched entry.  Headers are paired first.
+        When cache (a poutils.cache.Cache) is given, only the regions
+        changed since the last call are aligned again (see diff.align).
+        """
+        master_items = [item for item in self.items if item.msgid != ""]
+        translated_items = [item for item in translation.items if item.msgid != ""]
+        pairs = []
+        headers = [item for item in self.items if item.msgid == ""][:1]
+        headers += [item for item in translation.items if item.msgid == ""][:1]
+        if len(headers) == 2:
+            pairs.append(tuple(headers))
+
+        def key(item):
+            return (item.extracted[0], item.number_ref)
+
+        def score(a, b):
+            # same tag pattern and number of references, or only same tags
+            return 2 if a == b else (1 if a[0] == b[0] else 0)
+
+        for i, j in diff.align(
+            [key(item) for item in master_items],
+            [key(item) for item in translated_items],
+            score,
+            k=k,
+            band=band,
+            cache=cache,
+            name="align_pots " + cache_versions["align"],
+        ):
+            pairs.append(
+                (
+                    None if i is None else master_items[i],
+                    None if j is None else translated_items[j],
+                )
+            )
+        return pairs
+
+    def combine_aligned(self, translation, k=4, band=100, cache=None):
+        """
+        Set msgstr from msgid of translation paired by align_pots
+
+        Unmatched entries of both sides are reported.
+        """
+        self.invalidate()
+        num_pairs = 0
+        num_warn_ref = 0
+        unmatched = []
+        pairs = self.align_pots(translation, k=k, band=band, cache=cache)
+        for item, translated in pairs:
+            if item is None:
+                unmatched.append(("translation", translated))
+            elif translated is None:
+                item.add_line("extracted", "# WARN: no matching translation")
+                unmatched.append(("master", item))
+            else:
+                num_pairs += 1
+                if item.number_ref != translated.number_ref:
+                    num_warn_ref += 1
+                    item.add_line(
+                        "reference",
+                        "# WARN: mismatched references: {} --> {}".format(
+                            item.number_ref, translated.number_ref
+                        ),
+                    )
+                    item.add_lines("reference", translated.reference)
+                if item.msgid == "":
+                    item.msgstr = translated.msgstr
+                else:
+                    item.msgstr = translated.msgid
+        position = {}
+        for items in (self.items, translation.items):
+            position.update((id(item), n + 1) for n, item in enumerate(items))
+        for side, item in unmatched:
+            print(
+                'W: unmatched {} entry {}: {} "{}"'.format(
+                    side, position[id(item)], item.extracted[0], item.msgid[:40]
+                )
+            )
+        num_master = sum(1 for side, item in unmatched if side == "master")
+        print(
+            "I: *** aligned: {} pairs, unmatched: master {}, translation {}".format(
+                num_pairs, num_master, len(unmatched) - num_master
+            )
+        )
+        if num_warn_ref > 0:
+            print("W: *** mismatched references: {}".format(num_warn_ref))
+        return
+
 
 #######################################################################
 if __name__ == "__main__":
@@ -0,0 +1,290 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Copyright © 2021 Osamu Aoki
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the
+"Software"), to deal in the Software without restriction, including
+without limitation the rights to use, copy, modify, merge, publish,
+distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to
+the following conditions:
+
+The above copyright notice and this permission notice shall be included
+in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+Persistent caches shared by the po_* commands
+"""
+import hashlib
+import marshal
+import os  # for os.path.basename etc.
+import shutil
+import sqlite3
+import tempfile
+import time
+
+#######################################################################
+# Cache
+#######################################################################
+max_entries = 500000  # default size cap per cache file
+touch_interval = 3600 * 10**9  # ns; LRU stamps of hits are refreshed after this
+# format of the data cached by each user: increment it when the data changes
+formats = {"check": 1, "wdiff": 1, "align": 1, "parse": 1}
+
+
+def version_key(version, name):
+    """
+    Return the version part of the keys of cached data of name
+
+    It changes with the poutils version and with formats[name].
+    """
+    return "{} {}.{}".format(name, version, formats[name])
+
+
+def cache_dir():
+    """
+    Return the poutils cache directory ($XDG_CACHE_HOME/poutils)
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "poutils")
+
+
+def cache_names():
+    """
+    Return the names of the existing caches
+    """
+    try:
+        files = os.listdir(cache_dir())
+    except FileNotFoundError:
+        return []
+    return sorted(f[: -len(".sqlite3")] for f in files if f.endswith(".sqlite3"))
+
+
+class Cache:
+    """
+    Key-value store of marshal-able results with LRU eviction
+
+    Keys are made by key() from the inputs of the cached computation.
+    Hits and new results are written back by close(), which also evicts
+    the least recently used entries beyond max_entries and adds hits and
+    misses to the statistics kept in the cache file.
+    """
+
+    def __init__(self, name, path=None, max_entries=max_entries):
+        if path is None:
+            path = os.path.join(cache_dir(), name + ".sqlite3")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.used = []
+        self.new = []
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key BLOB PRIMARY KEY, value BLOB, last_used INTEGER)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache (last_used)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)"
+        )
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    @staticmethod
+    def key(*parts):
+        """
+        Return a hash of parts (str() of each, which must not contain NUL)
+        """
+        data = "\0".join(map(str, parts)).encode("utf-8")
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def get_many(self, keys, batch=500):
+        """
+        Return a dict of cached values for those of keys found
+        """
+        found = {}
+        stale = time.time_ns() - touch_interval
+        keys = list(dict.fromkeys(keys))
+        for i in range(0, len(keys), batch):
+            chunk = keys[i : i + batch]
+            rows = self.db.execute(
+                "SELECT key, value, last_used FROM cache WHERE key IN ({})".format(
+                    ",".join("?" * len(chunk))
+                ),
+                chunk,
+            )
+            for key, value, last_used in rows:
+                found[key] = marshal.loads(value)
+                if last_used < stale:
+                    self.used.append((key,))
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key):
+        """
+        Return the cached value for key or None
+        """
+        return self.get_many([key]).get(key)
+
+    def put(self, key, value):
+        self.new.append((key, marshal.dumps(value)))
+        return
+
+    def close(self):
+        """
+        Write back new results and the LRU stamps, then evict old entries
+        """
+        if self.db is None:
+            return
+        now = time.time_ns()
+        with self.db:
+            self.db.executemany(
+                "UPDATE cache SET last_used = {} WHERE key = ?".format(now), self.used
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, {})".format(now), self.new
+            )
+            self.db.executemany(
+                "INSERT INTO stats VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                (("hits", self.hits), ("misses", self.misses)),
+            )
+            self._evict(self.max_entries)
+        self.db.close()
+        self.db = None
+        return
+
+    def _evict(self, max_entries):
+        (n,) = self.db.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if n <= max_entries:
+            return 0
+        self.db.execute(
+            "DELETE FROM cache WHERE key IN "
+            "(SELECT key FROM cache ORDER BY last_used LIMIT ?)",
+            (n - max_entries,),
+        )
+        return n - max_entries
+
+    def stats(self):
+        """
+        Return a dict of the number of entries, the size of the cache file
+        and the total hits and misses recorded so far
+        """
+        (n,) = self.db.execute("SELECT COUNT(*) FROM cache").fetchone()
+        stats = {"entries": n, "bytes": os.path.getsize(self.path)}
+        stats.update({"hits": 0, "misses": 0})
+        stats.update(self.db.execute("SELECT name, value FROM stats"))
+        return stats
+
+    def prune(self, max_entries=None, days=None):
+        """
+        Remove entries unused for days and the least recently used ones
+        beyond max_entries (all if both are None) and return their number
+        """
+        with self.db:
+            if max_entries is None and days is None:
+                n = self.db.execute("DELETE FROM cache").rowcount
+                self.db.execute("DELETE FROM stats")
+            else:
+                n = 0
+                if days is not None:
+                    oldest = time.time_ns() - int(days * 86400 * 10**9)
+                    n += self.db.execute(
+                        "DELETE FROM cache WHERE last_used < ?", (oldest,)
+                    ).rowcount
+                if max_entries is not None:
+                    n += self._evict(max_entries)
+        self.db.execute("VACUUM")
+        return n
+
+
+#######################################################################
+# Sidecar files of parsed PO files
+#######################################################################
+def sidecar_path(path):
+    """
+    Return the path of the sidecar file of path (.NAME.poutils next to it)
+    """
+    head, tail = os.path.split(path)
+    return os.path.join(head, "." + tail + ".poutils")
+
+
+def file_digest(path, bufsize=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(bufsize), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+def read_sidecar(path, version):
+    """
+    Return (data, stamp) where data is what write_sidecar() saved for the
+    current content of path, or None
+
+    stamp is (version, size, mtime, content hash) of path to be passed to
+    write_sidecar().  The content is hashed only when the others match or
+    data is None.
+    """
+    st = os.stat(path)
+    stamp = (version, st.st_size, st.st_mtime_ns)
+    digest = None
+    try:
+        with open(sidecar_path(path), "rb") as fp:
+            saved = marshal.load(fp)
+            if tuple(saved[:3]) == stamp:
+                digest = file_digest(path)
+                if saved[3] == digest:
+                    # loads() of bytes is much faster than load() of a file
+                    return (marshal.loads(fp.read()), stamp + (digest,))
+    except (OSError, EOFError, ValueError, TypeError, IndexError):
+        pass  # missing, broken or old sidecar file
+    if digest is None:
+        digest = file_digest(path)
+    return (None, stamp + (digest,))
+
+
+def write_sidecar(path, stamp, data):
+    """
+    Save marshal-able data with stamp from read_sidecar() as the sidecar
+    file of path (skipped if it cannot be written)
+    """
+    try:
+        with tempfile.NamedTemporaryFile(
+            mode="wb",
+            dir=os.path.dirname(path) or ".",
+            prefix=os.path.basename(sidecar_path(path)) + ".",
+            delete=False,
+        ) as fp:
+            try:
+                marshal.dump(stamp, fp)
+                marshal.dump(data, fp)
+            except BaseException:
+                os.unlink(fp.name)
+                raise
+        shutil.copymode(path, fp.name)
+        os.replace(fp.name, sidecar_path(path))
+    except OSError:
+        pass  # e.g., read-only directory
+    return
@@ -0,0 +1,519 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Copyright © 2021 Osamu Aoki
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the
+"Software"), to deal in the Software without restriction, including
+without limitation the rights to use, copy, modify, merge, publish,
+distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to
+the following conditions:
+
+The above copyright notice and this permission notice shall be included
+in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Common command line handling shared by the po_* commands
+"""
+import concurrent.futures
+import contextlib
+import cProfile
+import glob
+import json
+import os  # for os.path.basename etc.
+import resource
+import sys  # sys.stderr etc.
+import time
+
+import poutils
+from poutils import watch
+
+#######################################################################
+# Multiple PO files
+#######################################################################
+def add_po_arguments(p, help):
+    """
+    Add the "po" positional arguments and the -j option
+    """
+    p.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of parallel processes (0: all CPUs)",
+    )
+    add_parse_cache_argument(p)
+    add_stats_arguments(p)
+    p.add_argument("po", nargs="+", help=help + "  Glob patterns are expanded.")
+    return
+
+
+def add_parse_cache_argument(p):
+    p.add_argument(
+        "--parse-cache",
+        action="store_true",
+        default=False,
+        help="read PO files via .NAME.poutils sidecar files of parsed data",
+    )
+    return
+
+
+def add_stats_arguments(p):
+    p.add_argument(
+        "--stats",
+        choices=("text", "json"),
+        default=None,
+        help="report time of each phase, counts and peak memory to stderr",
+    )
+    p.add_argument(
+        "--profile",
+        metavar="FILE",
+        default=None,
+        help="dump cProfile data to FILE (all work is done in one process)",
+    )
+    return
+
+
+def expand_po(patterns):
+    """
+    Expand glob patterns unless a file has the same name
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.exists(pattern) or not glob.has_magic(pattern):
+            files.append(pattern)
+        else:
+            matched = sorted(glob.glob(pattern))
+            if matched == []:
+                files.append(pattern)  # reported as an error later
+            files.extend(matched)
+    return files
+
+
+def entry_jobs(args):
+    """
+    Return the number of processes for the entries of a single PO file
+
+    -j is used for the files when many are given, else for the entries.
+    """
+    if len(expand_po(args.po)) != 1 or args.profile:
+        return 1
+    return args.jobs if args.jobs > 0 else os.cpu_count()
+
+
+def parse_jobs(args):
+    """
+    Return the number of processes to parse a single PO file (see entry_jobs)
+    """
+    if not hasattr(args, "jobs"):
+        return 1  # e.g., po_combine
+    return entry_jobs(args)
+
+
+def read_po(po, args, verbose=False, counts=None):
+    """
+    Return PotData of PO file po, read via its sidecar file if --parse-cache
+
+    A single PO file given with -j N is parsed in N processes.  If it has
+    an illegal line, it is read again as without -j, which reports the
+    line and goes on.  The time is added to the "parse" phase of counts
+    if given.
+    """
+    master = poutils.PotData()
+    with phase(counts, "parse"):
+        if args.parse_cache:
+            master.read_po_cached(po, verbose=verbose)
+            return master
+        if parse_jobs(args) > 1 and not verbose:
+            try:
+                master.read_po_parallel(po, jobs=parse_jobs(args))
+                return master
+            except poutils.PoParseError:
+                master = poutils.PotData()  # items parsed before the error
+        with open(po, "r") as fp:
+            master.read_po(file=fp, verbose=verbose)
+    return master
+
+
+def stream_items(po, args, counts, parse=False):
+    """
+    Return PotItems of PO file po for PotData.stream_po(items=...)
+
+    They are read from its sidecar file if --parse-cache, or in parallel
+    by read_po() with -j, or parsed while streaming them with --stats to
+    time the "parse" phase or if parse.  Otherwise, None is returned to
+    let stream_po() parse po.
+    """
+    if args.parse_cache or parse_jobs(args) > 1:
+        return read_po(po, args, counts=counts).items
+    if args.stats or parse:
+        fp = open(po, "r")
+
+        def items():
+            with fp:
+                yield from poutils.PotData().iter_po(file=fp)
+
+        if not args.stats:
+            return items()
+        return timed_items(counts, "parse", items())
+    return None
+
+
+def stream_transform(counts, args, transform):
+    """
+    Return transform for PotData.stream_po() timing the "transform" phase
+    with --stats
+    """
+    if not args.stats:
+        return transform
+
+    def timed_transform(item):
+        frame = _enter()
+        try:
+            transform(item)
+        finally:
+            _leave(counts, "transform", frame)
+
+    return timed_transform
+
+
+def new_counts(po):
+    return {
+        "po": po,
+        "entries": 0,
+        "fuzzy": 0,
+        "warnings": 0,
+        "error": None,
+        "times": {},
+        "children_cpu": 0.0,
+        "maxrss": 0,
+    }
+
+
+def count_item(counts, item):
+    """
+    Count an active entry (header and obsolete ones are not counted)
+    """
+    if item.msgid != "" and len(item.obsolete) == 0:
+        counts["entries"] += 1
+        if item.is_fuzzy():
+            counts["fuzzy"] += 1
+    return
+
+
+def count_entries(items):
+    """
+    Return the number of active entries of items (see count_item)
+    """
+    return sum(1 for item in items if item.msgid != "" and len(item.obsolete) == 0)
+
+
+#######################################################################
+# Instrumentation (--stats and --profile)
+#######################################################################
+_frames = []  # [start, time of nested phases] of the running phases
+
+
+def _enter():
+    frame = [time.perf_counter(), 0.0]
+    _frames.append(frame)
+    return frame
+
+
+def _leave(counts, name, frame):
+    _frames.pop()
+    elapsed = time.perf_counter() - frame[0]
+    if _frames:
+        _frames[-1][1] += elapsed
+    times = counts["times"]
+    times[name] = times.get(name, 0.0) + elapsed - frame[1]
+    return
+
+
+@contextlib.contextmanager
+def phase(counts, name):
+    """
+    Add the time of the with block to counts["times"][name]
+
+    The time of the phases nested in it is added only to them.  Nothing
+    is timed if counts is None.
+    """
+    if counts is None:
+        yield
+        return
+    frame = _enter()
+    try:
+        yield
+    finally:
+        _leave(counts, name, frame)
+
+
+def timed_items(counts, name, items):
+    """
+    Yield from items adding the time to get each to phase name
+    """
+    items = iter(items)
+    while True:
+        frame = _enter()
+        try:
+            item = next(items, None)
+        finally:
+            _leave(counts, name, frame)
+        if item is None:
+            return
+        yield item
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+
+
+def _run_one(func, po, args):
+    cpu = _children_cpu()
+    try:
+        counts = func(po, args)
+    except Exception as err:
+        counts = new_counts(po)
+        counts["error"] = "{}: {}".format(type(err).__name__, err)
+    # msguniq (and the worker processes of -j for entries)
+    counts["children_cpu"] = _children_cpu() - cpu
+    counts["maxrss"] = _maxrss()
+    return counts
+
+
+@contextlib.contextmanager
+def session(name, args, results):
+    """
+    Run the with block under cProfile with --profile and report --stats
+    of the counts appended to results in it
+
+    The counts yielded are for the phases in this process outside files.
+    """
+    main = new_counts(None)
+    profiler = None
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    cpu = _children_cpu()
+    try:
+        yield main
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+    if args.stats:
+        wall = time.perf_counter() - start
+        cpu = _children_cpu() - cpu
+        report_stats(name, [main] + results, wall, cpu, args.stats)
+    return
+
+
+def report_stats(name, results, wall, children_cpu, format):
+    """
+    Print the phase times, counts and peak memory of results to stderr
+
+    children_cpu is the CPU time of msguniq and the worker processes.
+    """
+    stats = {
+        "command": name,
+        "files": sum(1 for r in results if r["po"] is not None),
+        "errors": sum(1 for r in results if r["error"]),
+        "wall": wall,
+        "times": {},
+        "children_cpu": children_cpu,
+        "maxrss": _maxrss(),
+    }
+    for key in ("entries", "fuzzy", "warnings"):
+        stats[key] = sum(r[key] for r in results)
+    for r in results:
+        for phase_name, t in r["times"].items():
+            stats["times"][phase_name] = stats["times"].get(phase_name, 0.0) + t
+        stats["maxrss"] = max(stats["maxrss"], r["maxrss"])
+    if format == "json":
+        stats["per_file"] = [r for r in results if r["po"] is not None]
+        print(json.dumps(stats, indent=1), file=sys.stderr)
+        return
+    phases = ", ".join(
+        "{} {:.3f}s".format(phase_name, t) for phase_name, t in stats["times"].items()
+    )
+    print(
+        "I: {}: stats: {}; wall {:.3f}s, child cpu {:.3f}s, peak rss {} MiB".format(
+            name,
+            phases,
+            stats["wall"],
+            stats["children_cpu"],
+            stats["maxrss"] // 1024,
+        ),
+        file=sys.stderr,
+    )
+    print(
+        "I: {}: stats: {} files, {} entries, {} fuzzy, {} warnings, {} errors".format(
+            name,
+            stats["files"],
+            stats["entries"],
+            stats["fuzzy"],
+            stats["warnings"],
+            stats["errors"],
+        ),
+        file=sys.stderr,
+    )
+    return
+
+
+_prepared = None  # what prepare(args) of run_batch() returned
+
+
+def prepared():
+    """
+    Return what prepare(args) of run_batch() returned (in its workers, too)
+    """
+    return _prepared
+
+
+def _set_prepared(data):
+    # run in this process and as the initializer of the worker processes
+    global _prepared
+    _prepared = data
+    return
+
+
+def run_batch(name, func, args, prepare=None):
+    """
+    Run func(po, args) for each of args.po in up to args.jobs processes
+
+    func returns counts made by new_counts() which are combined into one
+    summary on stderr when there are many files or errors.  See session()
+    for --stats and --profile.  prepare(args) is called before them in
+    this process, e.g., to make data used for all files.  func gets what
+    it returns by prepared(), which is passed to each worker process
+    whatever its start method is.
+    """
+    files = expand_po(args.po)
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    jobs = 1 if args.profile else min(jobs, len(files))
+    results = []
+    with session(name, args, results) as main:
+        if prepare is not None:
+            with phase(main, "prepare"):
+                _set_prepared(prepare(args))
+        if jobs <= 1:
+            results.extend(_run_one(func, po, args) for po in files)
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=jobs, initializer=_set_prepared, initargs=(_prepared,)
+            ) as pool:
+                futures = [pool.submit(_run_one, func, po, args) for po in files]
+                results.extend(f.result() for f in futures)
+    errors = [r for r in results if r["error"]]
+    for r in errors:
+        print("E: {}: {}: {}".format(name, r["po"], r["error"]), file=sys.stderr)
+    if len(files) > 1 or errors:
+        total = new_counts(None)
+        for r in results:
+            for key in ("entries", "fuzzy", "warnings"):
+                total[key] += r[key]
+        print(
+            "I: {}: {} files, {} entries, {} fuzzy, {} warnings, {} errors".format(
+                name,
+                len(files),
+                total["entries"],
+                total["fuzzy"],
+                total["warnings"],
+                len(errors),
+            ),
+            file=sys.stderr,
+        )
+    if errors:
+        sys.exit(1)
+    return results
+
+
+#######################################################################
+# Watch mode (--watch)
+#######################################################################
+def add_watch_arguments(p):
+    p.add_argument(
+        "--watch",
+        action="store_true",
+        default=False,
+        help="stay resident and process PO files again each time they are saved",
+    )
+    p.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="--watch: seconds between polls of mtime and size (default: 1.0)",
+    )
+    return
+
+
+def run_watch(name, func, args):
+    """
+    Run func(po, args, watcher) for each of args.po whenever it is saved
+
+    watcher is the poutils.watch.Watcher of po kept between the runs.
+    func returns counts with "changed", the number of entries parsed
+    again (see count_entries).  Each run is reported on stderr (see
+    session() for --stats) until interrupted.
+    """
+    watchers = [watch.Watcher(po) for po in expand_po(args.po)]
+    print(
+        "I: {}: watching {} files every {}s (Ctrl-C to stop)".format(
+            name, len(watchers), args.interval
+        ),
+        file=sys.stderr,
+    )
+    try:
+        while True:
+            for watcher in watchers:
+                if not watcher.changed():
+                    continue
+                start = time.perf_counter()
+                results = []
+                with session(name, args, results):
+                    results.append(
+                        _run_one(
+                            lambda po, args: func(po, args, watcher),
+                            watcher.path,
+                            args,
+                        )
+                    )
+                r = results[0]
+                if r["error"]:
+                    print(
+                        "E: {}: {}: {}".format(name, r["po"], r["error"]),
+                        file=sys.stderr,
+                    )
+                    continue
+                print(
+                    "I: {}: {}: {} of {} entries processed, {} warnings "
+                    "({:.3f}s)".format(
+                        name,
+                        r["po"],
+                        r["changed"],
+                        r["entries"],
+                        r["warnings"],
+                        time.perf_counter() - start,
+                    ),
+                    file=sys.stderr,
+                )
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    return
@@ -0,0 +1,268 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Copyright © 2021 Osamu Aoki
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the
+"Software"), to deal in the Software without restriction, including
+without limitation the rights to use, copy, modify, merge, publish,
+distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to
+the following conditions:
+
+The above copyright notice and this permission notice shall be included
+in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Columnar view of PotData for repeated bulk selections (NumPy if available)
+"""
+import itertools as IT
+import operator
+import re
+
+try:
+    import numpy
+except ImportError:  # pure Python columns and masks
+    numpy = None
+
+#######################################################################
+# Columns and masks: NumPy arrays or lists
+#######################################################################
+def array(values):
+    """
+    Return a column of Python objects (str) from a list
+    """
+    if numpy is None:
+        return values
+    result = numpy.empty(len(values), dtype=object)
+    result[:] = values
+    return result
+
+
+def mask(values, n):
+    """
+    Return a boolean mask of n rows from an iterable
+    """
+    if numpy is None:
+        return list(map(bool, values))
+    return numpy.fromiter(values, dtype=bool, count=n)
+
+
+def zeros(n):
+    if numpy is None:
+        return [False] * n
+    return numpy.zeros(n, dtype=bool)
+
+
+def equal(a, b):
+    """
+    Return the mask of the rows where the columns a and b are equal
+    """
+    if numpy is None:
+        return list(map(operator.eq, a, b))
+    return a == b
+
+
+def mask_and(a, b):
+    if numpy is None:
+        return list(map(operator.and_, a, b))
+    return a & b
+
+
+def mask_or(a, b):
+    if numpy is None:
+        return list(map(operator.or_, a, b))
+    return a | b
+
+
+def mask_not(a):
+    if numpy is None:
+        return list(map(operator.not_, a))
+    return ~a
+
+
+def take(table, index):
+    """
+    Return table[i] for each i of an index column as a mask
+    """
+    if numpy is None:
+        return list(map(table.__getitem__, index))
+    return numpy.asarray(table, dtype=bool)[index]
+
+
+def rows(a):
+    """
+    Return the list of the row numbers selected by mask a
+    """
+    if numpy is None:
+        return list(IT.compress(range(len(a)), a))
+    return numpy.flatnonzero(a).tolist()
+
+
+class Categories(dict):
+    """
+    Dictionary numbering tuples of comment lines as they are looked up
+    """
+
+    def __missing__(self, key):
+        value = self[key] = len(self)
+        return value
+
+
+class Matches(dict):
+    """
+    Dictionary of whether regex matches a line of each tuple of comment lines
+    """
+
+    def __init__(self, regex):
+        self.regex = regex
+        return
+
+    def __missing__(self, key):
+        value = self[key] = any(map(self.regex.search, key))
+        return value
+
+
+#######################################################################
+# Columnar catalog
+#######################################################################
+class Columns:
+    """
+    Columns of msgid, msgstr, fuzzy and extracted comments of a PotData
+
+    The columns are made once, so that repeated selections are boolean
+    masks computed without visiting the PotItems.  With NumPy, msgid and
+    msgstr are object arrays compared element-wise in C.  Regexes run
+    only on the selected rows, or once for each distinct tuple of
+    extracted comment lines (category).  The bulk operations change the
+    selected PotItems, which PotData sees, and keep the columns up to
+    date.  Call reset() after changing the items otherwise.
+
+    Use PotData methods for a single operation: making the columns costs
+    about as much as one of their loops.
+    """
+
+    def __init__(self, master):
+        self.master = master
+        self.reset()
+        return
+
+    def __len__(self):
+        return len(self.items)
+
+    def reset(self):
+        """
+        Make the columns from the items of the PotData
+        """
+        items = self.items = self.master.items
+        self.msgid = array([item.msgid for item in items])
+        self.msgstr = array([item.msgstr for item in items])
+        self.fuzzy = mask(["fuzzy" in item.flags for item in items], len(items))
+        # category of each item: index into the distinct extracted comments
+        ids = Categories()
+        category = [ids[tuple(item.extracted)] for item in items]
+        if numpy is not None:
+            category = numpy.array(category, dtype=numpy.intp)
+        self.category = category
+        self.extracted_table = list(ids)
+        return
+
+    def same(self):
+        """
+        Return the mask of the items with msgstr the same as msgid
+        """
+        return equal(self.msgid, self.msgstr)
+
+    def search(self, regex, column, where=None):
+        """
+        Return the mask of the rows with column matching regex
+
+        Only the rows selected by mask where are matched if it is given.
+        """
+        if where is None:
+            return mask(map(regex.search, column), len(self.items))
+        found = zeros(len(self.items))
+        for i in rows(where):
+            if regex.search(column[i]):
+                found[i] = True
+        return found
+
+    def extracted(self, regex):
+        """
+        Return the mask of the items with an extracted comment line matching regex
+        """
+        table = self.extracted_table
+        return take(list(map(Matches(regex).__getitem__, table)), self.category)
+
+    def set_msgstr(self, where, source=None):
+        """
+        Set msgstr of the rows selected by mask where to "" (or column source)
+        """
+        items = self.items
+        msgstr = self.msgstr
+        for i in rows(where):
+            value = "" if source is None else source[i]
+            items[i].msgstr = value
+            msgstr[i] = value
+        self.master.invalidate()
+        return
+
+    def rm_fuzzy(self, where=None):
+        """
+        Remove fuzzy of the items selected by mask where (or all)
+        """
+        fuzzy = self.fuzzy
+        selected = fuzzy if where is None else mask_and(where, fuzzy)
+        for i in rows(selected):
+            self.items[i].rm_fuzzy()
+            fuzzy[i] = False
+        return
+
+    #######################################################################
+    # Bulk operations of PotData
+    #######################################################################
+    def rm_fuzzy_all(self):
+        self.rm_fuzzy()
+        return
+
+    def clean_msgstr(
+        self, pattern_extracted=None, pattern_msgid=None, keep_fuzzy=False
+    ):
+        """
+        Clean msgstr if msgid is the same except for pattern matches
+        """
+        same = self.same()
+        if pattern_msgid:
+            found = self.search(re.compile(pattern_msgid), self.msgid, same)
+            same = mask_and(same, mask_not(found))
+        clean = same
+        if pattern_extracted:
+            found = self.extracted(re.compile(pattern_extracted))
+            clean = mask_and(same, mask_not(found))
+        self.set_msgstr(clean)
+        if not keep_fuzzy:
+            self.rm_fuzzy(same)
+        return
+
+    def dup_msgstr(self, pattern_extracted=None, pattern_msgid=None, rm_fuzzy=True):
+        """
+        Duplicate msgid as msgstr for pattern matches
+        """
+        selected = zeros(len(self.items))
+        if pattern_msgid:
+            selected = self.search(re.compile(pattern_msgid), self.msgid)
+        if pattern_extracted:
+            found = self.extracted(re.compile(pattern_extracted))
+            selected = mask_or(selected, found)
+        self.set_msgstr(selected, self.msgid)
+        if rm_fuzzy:
+            self.rm_fuzzy(selected)
+        return
@@ -0,0 +1,342 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Copyright © 2021 Osamu Aoki
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the
+"Software"), to deal in the Software without restriction, including
+without limitation the rights to use, copy, modify, merge, publish,
+distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to
+the following conditions:
+
+The above copyright notice and this permission notice shall be included
+in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+Diff engines for wdiff_msgid and alignment of POT entries for combine_pots
+"""
+import bisect
+import difflib  # for wdiff
+import re
+
+#######################################################################
+# Myers O(ND) diff
+#######################################################################
+modes = ("char", "word")
+max_cost = 1000  # default limit of edits per entry for the word mode
+
+
+def myers(a, b, max_cost=None):
+    """
+    Return difflib style opcodes to turn sequence a into sequence b
+
+    This is the greedy O(ND) algorithm of E. Myers for D edits.  None is
+    returned if more than max_cost edits are needed.
+    """
+    n, m = len(a), len(b)
+    pre = 0
+    while pre < n and pre < m and a[pre] == b[pre]:
+        pre += 1
+    suf = 0
+    while suf < n - pre and suf < m - pre and a[n - 1 - suf] == b[m - 1 - suf]:
+        suf += 1
+    a = a[pre : n - suf]
+    b = b[pre : m - suf]
+    n, m = len(a), len(b)
+    limit = n + m if max_cost is None else min(n + m, max_cost)
+    offset = limit + 1
+    v = [0] * (2 * limit + 3)
+    trace = []
+    for d in range(limit + 1):
+        trace.append(v[offset - d - 1 : offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                moves = _backtrack(trace, d, n, m)
+                return _group(["="] * pre + moves + ["="] * suf)
+    return None
+
+
+def _backtrack(trace, d, n, m):
+    # moves ("=", "-" or "+") of the path found after d edits
+    moves = []
+    x, y = n, m
+    for d in range(d, 0, -1):
+        v = trace[d]  # after d - 1 edits; diagonal k at v[k + d + 1]
+        k = x - y
+        if k == -d or (k != d and v[k + d] < v[k + d + 2]):
+            px = v[k + d + 2]  # from diagonal k + 1 by "+"
+            py = px - k - 1
+            mx = px
+            op = "+"
+        else:
+            px = v[k + d]  # from diagonal k - 1 by "-"
+            py = px - k + 1
+            mx = px + 1
+            op = "-"
+        moves.extend("=" * (x - mx))
+        moves.append(op)
+        x, y = px, py
+    moves.extend("=" * x)
+    moves.reverse()
+    return moves
+
+
+def _group(moves):
+    # difflib style opcodes from moves
+    opcodes = []
+    i = j = 0
+    for op in moves:
+        di = op != "+"
+        dj = op != "-"
+        if opcodes and (opcodes[-1][0] == "equal") == (op == "="):
+            opcodes[-1][2] += di
+            opcodes[-1][4] += dj
+        else:
+            opcodes.append(["equal" if op == "=" else "", i, i + di, j, j + dj])
+        i += di
+        j += dj
+    for opcode in opcodes:
+        if opcode[0] == "":
+            opcode[0] = _tag(*opcode[1:])
+    return [tuple(opcode) for opcode in opcodes]
+
+
+def _tag(i1, i2, j1, j2):
+    if i1 == i2:
+        return "insert"
+    elif j1 == j2:
+        return "delete"
+    else:
+        return "replace"
+
+
+#######################################################################
+# wdiff opcodes of PO strings
+#######################################################################
+# escape sequences, white spaces, words and other characters
+_re_token = re.compile(r"\\.|\s+|\w+|[^\w\s]", re.DOTALL)
+
+
+def tokenize(s):
+    return _re_token.findall(s)
+
+
+def opcodes(a, b, mode="char", max_cost=max_cost):
+    """
+    Return difflib style opcodes to turn string a into string b
+
+    mode "char" uses difflib.SequenceMatcher on characters.  mode "word"
+    uses the Myers diff on words and white spaces, refined by characters
+    inside changed runs.  If more than max_cost edits are needed, the
+    whole string is replaced.
+    """
+    if mode == "char":
+        return difflib.SequenceMatcher(isjunk=None, a=a, b=b).get_opcodes()
+    elif mode != "word":
+        raise ValueError("unknown diff mode: {}".format(mode))
+    ta = tokenize(a)
+    tb = tokenize(b)
+    ops = myers(ta, tb, max_cost)
+    if ops is None:
+        return [(_tag(0, len(a), 0, len(b)), 0, len(a), 0, len(b))]
+    pa = [0]
+    for t in ta:
+        pa.append(pa[-1] + len(t))
+    pb = [0]
+    for t in tb:
+        pb.append(pb[-1] + len(t))
+    result = []
+    for tag, i1, i2, j1, j2 in ops:
+        i1, i2, j1, j2 = pa[i1], pa[i2], pb[j1], pb[j2]
+        if tag == "replace":
+            refined = _refine(a, b, i1, i2, j1, j2, max_cost)
+        else:
+            refined = [(tag, i1, i2, j1, j2)]
+        for opcode in refined:
+            if result and result[-1][0] == "equal" == opcode[0]:
+                i1, j1 = result[-1][1], result[-1][3]
+                result[-1] = ("equal", i1, opcode[2], j1, opcode[4])
+            else:
+                result.append(opcode)
+    return result
+
+
+def _refine(a, b, i1, i2, j1, j2, max_cost):
+    # character level opcodes inside a changed run if they are similar
+    ops = myers(a[i1:i2], b[j1:j2], max_cost)
+    if ops is not None:
+        same = sum(o[2] - o[1] for o in ops if o[0] == "equal")
+        if 2 * same >= max(i2 - i1, j2 - j1):
+            return [(o[0], i1 + o[1], i1 + o[2], j1 + o[3], j1 + o[4]) for o in ops]
+    return [("replace", i1, i2, j1, j2)]
+
+
+#######################################################################
+# Sequence alignment
+#######################################################################
+def align(a, b, score, k=4, band=100, cache=None, name="align"):
+    """
+    Return the alignment of sequences a and b as a list of (i, j) pairs
+
+    Either i or j is None for an element left unmatched.  k-grams found
+    once in each of a and b are anchors if they are in the same order.
+    The segments between anchors are aligned by a dynamic program which
+    maximizes the sum of score(a[i], b[j]) of the pairs within band
+    diagonals around the segment.  Elements are never paired for score 0.
+
+    When cache (a poutils.cache.Cache) is given, the alignment of each
+    segment is kept there by the str() of its elements, band and name
+    (which must tell score).  The anchors are always found again, so only
+    the segments changed since the last call are aligned, with the same
+    result.
+    """
+    anchors = _anchors(a, b, k)
+    starts = [(0, 0)] + [(i + k, j + k) for i, j in anchors]
+    ends = anchors + [(len(a), len(b))]
+    segments = [(i0, i1, j0, j1) for (i0, j0), (i1, j1) in zip(starts, ends)]
+    keys = [None] * len(segments)
+    found = {}
+    if cache is not None:
+        keys = [
+            cache.key(name, band, a[i0:i1], b[j0:j1])
+            if i0 < i1 and j0 < j1
+            else None
+            for i0, i1, j0, j1 in segments
+        ]
+        found = cache.get_many([key for key in keys if key is not None])
+    pairs = []
+    for n, (i0, i1, j0, j1) in enumerate(segments):
+        if n > 0:
+            i, j = anchors[n - 1]
+            pairs.extend((i + t, j + t) for t in range(k))
+        key = keys[n]
+        if key in found:
+            pairs.extend(
+                (None if i is None else i0 + i, None if j is None else j0 + j)
+                for i, j in found[key]
+            )
+            continue
+        segment = _align_band(a, b, i0, i1, j0, j1, score, band)
+        pairs.extend(segment)
+        if key is not None:
+            # relative to the segment to be found where it moves to
+            cache.put(
+                key,
+                [
+                    (None if i is None else i - i0, None if j is None else j - j0)
+                    for i, j in segment
+                ],
+            )
+    return pairs
+
+
+def _anchors(a, b, k):
+    # (i, j) of unique k-grams a[i : i + k] == b[j : j + k] in order
+    def unique_grams(s):
+        first = {}
+        for i in range(len(s) - k + 1):
+            g = tuple(s[i : i + k])
+            first[g] = -1 if g in first else i
+        return {g: i for g, i in first.items() if i >= 0}
+
+    grams_b = unique_grams(b)
+    found = sorted(
+        (i, grams_b[g]) for g, i in unique_grams(a).items() if g in grams_b
+    )
+    # longest increasing subsequence of j (patience sorting)
+    tails = []
+    tails_index = []
+    prev = []
+    for n, (i, j) in enumerate(found):
+        p = bisect.bisect_left(tails, j)
+        if p == len(tails):
+            tails.append(j)
+            tails_index.append(n)
+        else:
+            tails[p] = j
+            tails_index[p] = n
+        prev.append(tails_index[p - 1] if p else None)
+    chain = []
+    n = tails_index[-1] if tails_index else None
+    while n is not None:
+        chain.append(found[n])
+        n = prev[n]
+    chain.reverse()
+    anchors = []
+    next_i = next_j = 0
+    for i, j in chain:
+        if i >= next_i and j >= next_j:
+            anchors.append((i, j))
+            next_i, next_j = i + k, j + k
+    return anchors
+
+
+def _align_band(a, b, i0, i1, j0, j1, score, band):
+    # banded Needleman-Wunsch of a[i0:i1] and b[j0:j1] without gap cost
+    n = i1 - i0
+    m = j1 - j0
+    if n == 0 or m == 0:
+        return [(i, None) for i in range(i0, i1)] + [(None, j) for j in range(j0, j1)]
+    lo = min(0, m - n) - band  # diagonals j - i in [lo, hi]
+    hi = max(0, m - n) + band
+    width = hi - lo + 1
+    trace = []  # 0: pair, 1: a[i] unmatched, 2: b[j] unmatched
+    prev = None
+    for i in range(n + 1):
+        cur = [-1] * width
+        moves = bytearray(width)
+        for j in range(max(0, i + lo), min(m, i + hi) + 1):
+            x = j - i - lo
+            if i == 0:
+                cur[x] = 0
+                moves[x] = 2
+                continue
+            best = -1
+            if j > 0 and prev[x] >= 0:
+                s = score(a[i0 + i - 1], b[j0 + j - 1])
+                if s > 0:
+                    best = prev[x] + s
+            if x + 1 < width and prev[x + 1] > best:
+                best = prev[x + 1]
+                moves[x] = 1
+            if x > 0 and cur[x - 1] > best:
+                best = cur[x - 1]
+                moves[x] = 2
+            cur[x] = best
+        trace.append(moves)
+        prev = cur
+    pairs = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        move = trace[i][j - i - lo]
+        if move == 0:
+            i -= 1
+            j -= 1
+            pairs.append((i0 + i, j0 + j))
+        elif move == 1:
+            i -= 1
+            pairs.append((i0 + i, None))
+        else:
+            j -= 1
+            pairs.append((None, j0 + j))
+    pairs.reverse()
+    return pairs
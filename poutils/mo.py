@@ -0,0 +1,273 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Copyright © 2021 Osamu Aoki
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the
+"Software"), to deal in the Software without restriction, including
+without limitation the rights to use, copy, modify, merge, publish,
+distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to
+the following conditions:
+
+The above copyright notice and this permission notice shall be included
+in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+GNU MO files: writer with the hash table of msgfmt and mmap-backed reader
+"""
+import mmap
+import struct
+
+#######################################################################
+# Writer
+#######################################################################
+magic = 0x950412DE
+header_size = 28  # revision 0 without system dependent strings
+
+
+def hashpjw(key):
+    """
+    Return the hash of bytes key as __hash_string() of gettext does
+
+    The hash stops at NUL, so msgid_plural after msgid is not hashed.
+    """
+    h = 0
+    for c in key.partition(b"\0")[0]:
+        h = (h << 4) + c
+        g = h & 0xF0000000
+        if g:
+            # bits above 31 never reach the low 28 bits: mask only here
+            h = (h ^ (g >> 24)) & 0x0FFFFFFF
+    return h & 0xFFFFFFFF
+
+
+def next_prime(seed):
+    """
+    Return next_prime(seed) of gettext for the hash table size
+
+    This is the first odd number from seed with no odd divisor up to its
+    square root, starting from 3 (hence 1 for 0 and 5 for 2 or 3).
+    """
+    seed |= 1
+    while True:
+        d = 3
+        while d * d < seed and seed % d != 0:
+            d += 2
+        if seed % d != 0:
+            return seed
+        seed += 2
+
+
+def hash_table(keys):
+    """
+    Return the hash table of msgfmt for sorted keys (entry number + 1)
+    """
+    size = max(next_prime(len(keys) * 4 // 3), 3)
+    table = [0] * size
+    for n, key in enumerate(keys):
+        h = hashpjw(key)
+        i = h % size
+        if table[i] != 0:
+            incr = 1 + h % (size - 2)
+            while table[i] != 0:
+                if i >= size - incr:
+                    i -= size - incr
+                else:
+                    i += incr
+        table[i] = n + 1
+    return table
+
+
+def write(file, pairs, no_hash=False):
+    """
+    Write (key, value) pairs of bytes to binary file as a GNU MO file
+
+    key is msgid or msgctxt + b"\\x04" + msgid, followed by b"\\0" +
+    msgid_plural for plural forms.  The layout is the same as "msgfmt" of
+    GNU gettext in the native byte order ("msgfmt --no-hash" if no_hash).
+    """
+    pairs = sorted(pairs)
+    n = len(pairs)
+    if no_hash:
+        table = []
+    else:
+        table = hash_table([key for key, value in pairs])
+    orig_offset = header_size
+    trans_offset = orig_offset + 8 * n
+    hash_offset = trans_offset + 8 * n
+    offset = hash_offset + 4 * len(table)
+    orig = []
+    for key, value in pairs:
+        orig.extend((len(key), offset))
+        offset += len(key) + 1
+    trans = []
+    for key, value in pairs:
+        trans.extend((len(value), offset))
+        offset += len(value) + 1
+    file.write(
+        struct.pack(
+            "=7I", magic, 0, n, orig_offset, trans_offset, len(table), hash_offset
+        )
+    )
+    file.write(struct.pack("={}I".format(2 * n), *orig))
+    file.write(struct.pack("={}I".format(2 * n), *trans))
+    file.write(struct.pack("={}I".format(len(table)), *table))
+    file.write(b"".join(key + b"\0" for key, value in pairs))
+    file.write(b"".join(value + b"\0" for key, value in pairs))
+    return
+
+
+#######################################################################
+# Reader
+#######################################################################
+class MoError(ValueError):
+    """
+    Broken or unsupported MO file
+    """
+
+
+class MoFile:
+    """
+    GNU MO file memory-mapped for lookups
+
+    Only the strings compared and found are read from the file.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as fp:
+            size = fp.seek(0, 2)
+            if size < header_size:
+                raise MoError("{}: too short for an MO file".format(path))
+            self.data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        for order in "<>":
+            if struct.unpack_from(order + "I", self.data)[0] == magic:
+                break
+        else:
+            self.close()
+            raise MoError("{}: bad magic number".format(path))
+        (
+            revision,
+            self.nstrings,
+            self.orig_offset,
+            self.trans_offset,
+            self.hash_size,
+            self.hash_offset,
+        ) = struct.unpack_from(order + "6I", self.data, 4)
+        if revision >> 16 != 0:
+            self.close()
+            raise MoError("{}: unknown revision {:#x}".format(path, revision))
+        end = max(
+            self.orig_offset + 8 * self.nstrings,
+            self.trans_offset + 8 * self.nstrings,
+            self.hash_offset + 4 * self.hash_size,
+        )
+        if end > size:
+            self.close()
+            raise MoError("{}: truncated MO file".format(path))
+        self.order = order
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self.data.close()
+        return
+
+    def __len__(self):
+        return self.nstrings
+
+    def _string(self, offset, n):
+        length, start = struct.unpack_from(
+            self.order + "2I", self.data, offset + 8 * n
+        )
+        return self.data[start : start + length]
+
+    def _msgid(self, n):
+        # msgid_plural after NUL is not compared as strcmp() of gettext
+        return self._string(self.orig_offset, n).partition(b"\0")[0]
+
+    def find(self, key):
+        """
+        Return the entry number of bytes key or -1
+
+        The sorted msgid are searched by bisection.  Comparing strings in
+        the mmap is faster than computing hashpjw(key) in Python.
+        """
+        key = key.partition(b"\0")[0]
+        lo = 0
+        hi = self.nstrings
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._msgid(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.nstrings and self._msgid(lo) == key:
+            return lo
+        return -1
+
+    def find_hashed(self, key):
+        """
+        Return the entry number of bytes key or -1 using the hash table
+
+        This probes as the gettext runtime does, so it checks the hash
+        table of an MO file.  Without the hash table, this is find(key).
+        """
+        if self.hash_size <= 2:
+            return self.find(key)
+        key = key.partition(b"\0")[0]
+        h = hashpjw(key)
+        size = self.hash_size
+        i = h % size
+        incr = 1 + h % (size - 2)
+        for _ in range(size):
+            (n,) = struct.unpack_from(
+                self.order + "I", self.data, self.hash_offset + 4 * i
+            )
+            if n == 0:
+                return -1
+            if n <= self.nstrings and self._msgid(n - 1) == key:
+                return n - 1
+            if i >= size - incr:
+                i -= size - incr
+            else:
+                i += incr
+        return -1
+
+    def lookup(self, msgid, msgctxt=""):
+        """
+        Return msgstr of msgid (and msgctxt) as str, or None if not found
+
+        The plural forms of a msgstr are separated by NUL.
+        """
+        key = msgid.encode("utf-8")
+        if msgctxt:
+            key = msgctxt.encode("utf-8") + b"\x04" + key
+        n = self.find(key)
+        if n < 0:
+            return None
+        return self._string(self.trans_offset, n).decode("utf-8")
+
+    def __iter__(self):
+        """
+        Yield (msgctxt, msgid, msgstr) of all entries as str in order
+        """
+        for n in range(self.nstrings):
+            key = self._string(self.orig_offset, n).decode("utf-8")
+            msgctxt, eot, msgid = key.rpartition("\x04")
+            yield (msgctxt, msgid, self._string(self.trans_offset, n).decode("utf-8"))
+        return
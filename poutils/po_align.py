@@ -30,6 +30,7 @@ import copy
 
 # To test this in place, setup a symlink with "ln -sf . poutils"
 import poutils
+from poutils import cli
 
 #######################################################################
 # main program
@@ -47,27 +48,34 @@ def po_align():
         ),
         epilog="See {}(1) manpage for more.".format(name),
     )
-    p.add_argument("po", help="Input PO file name.  Output PO file suffix: .aligned")
+    cli.add_po_arguments(p, "Input PO file names.  Output PO file suffix: .aligned")
     args = p.parse_args()
-    master = poutils.PotData()
-    with open(args.po, "r") as fp:
-        master.read_po(file=fp)
-    master.set_all_index()
-    index_map = []
-    for j, item in enumerate(master):
-        for i in item.index:
-            index_map.append((i, j))
-    index_map.sort()
-    aligned = poutils.PotData()
-    for i, j in index_map:
-        aligned.append(copy.copy(master[j]))
-    aligned.set_all_syncid()
-    with open(args.po + ".aligned", "w") as fp:
-        # Never use msguniq here
-        aligned.output_raw(file=fp)
+    cli.run_batch(name, po_align_file, args)
     return
 
 
+def po_align_file(po, args):
+    counts = cli.new_counts(po)
+    master = cli.read_po(po, args, counts=counts)
+    with cli.phase(counts, "transform"):
+        master.set_all_index()
+        index_map = []
+        for j, item in enumerate(master):
+            for i in item.index:
+                index_map.append((i, j))
+        index_map.sort()
+        aligned = poutils.PotData()
+        for i, j in index_map:
+            aligned.append(copy.copy(master[j]))
+        aligned.set_all_syncid()
+    with cli.phase(counts, "write"), open(po + ".aligned", "wb") as fp:
+        # Never use msguniq here
+        aligned.output_raw_bytes(file=fp)
+    for item in aligned:
+        cli.count_item(counts, item)
+    return counts
+
+
 #######################################################################
 if __name__ == "__main__":
     po_align()
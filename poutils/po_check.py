@@ -29,6 +29,8 @@ import os  # for os.path.basename etc.
 
 # To test this in place, setup a symlink with "ln -sf . poutils"
 import poutils
+from poutils import cli
+from poutils import cache
 
 #######################################################################
 # main program
@@ -67,17 +69,96 @@ def po_check():
         default=False,
         help="raw output without msguniq",
     )
-    p.add_argument("po", help="Input PO file name.  Output PO file suffix: .checked")
+    p.add_argument(
+        "-u",
+        "--msguniq",
+        action="store_true",
+        default=False,
+        help="use msguniq command instead of the built-in writer",
+    )
+    p.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="do not use the result cache in {}".format(cache.cache_dir()),
+    )
+    cli.add_watch_arguments(p)
+    cli.add_po_arguments(p, "Input PO file names.  Output PO file suffix: .checked")
     args = p.parse_args()
-    master = poutils.PotData()
-    with open(args.po, "r") as fp:
-        master.read_po(file=fp)
-    master.check_xml(force_check=args.force_check, itstool=args.itstool)
-    with open(args.po + ".checked", "w") as fp:
-        master.output_po(file=fp, raw=args.raw)
+    args.entry_jobs = cli.entry_jobs(args)
+    if args.watch:
+        cli.run_watch(name, po_check_watch, args)
+    else:
+        cli.run_batch(name, po_check_file, args)
     return
 
 
+def check_xml(master, args, warned=None):
+    """
+    Check master as args say and return the number of entries with warnings
+    """
+    if args.no_cache:
+        return master.check_xml(
+            force_check=args.force_check,
+            itstool=args.itstool,
+            jobs=args.entry_jobs,
+            warned=warned,
+        )
+    with cache.Cache("check") as c:
+        return master.check_xml(
+            force_check=args.force_check,
+            itstool=args.itstool,
+            cache=c,
+            jobs=args.entry_jobs,
+            warned=warned,
+        )
+
+
+def po_check_file(po, args):
+    counts = cli.new_counts(po)
+    master = cli.read_po(po, args, counts=counts)
+    with cli.phase(counts, "transform"):
+        counts["warnings"] = check_xml(master, args)
+    with cli.phase(counts, "write"), open(po + ".checked", "w") as fp:
+        master.output_po(file=fp, raw=args.raw, msguniq=args.msguniq)
+    for item in master:
+        cli.count_item(counts, item)
+    return counts
+
+
+def po_check_watch(po, args, watcher):
+    """
+    Check only the entries changed since the last run of --watch
+
+    The unchanged entries keep the warnings of the run which checked them,
+    so the warnings are counted for the whole file as po_check does.
+    """
+    counts = cli.new_counts(po)
+    warned = []
+
+    def transform(items):
+        with cli.phase(counts, "transform"):
+            changed = poutils.PotData()
+            changed.items = items
+            check_xml(changed, args, warned=warned)
+
+    with cli.phase(counts, "parse"):
+        master, new = watcher.read(transform)
+    # the items of unchanged entries are kept by watcher between the runs
+    warned = watcher.state.get("warned", set()).union(warned)
+    warned = [item for item in master if item in warned]
+    watcher.state["warned"] = set(warned)
+    counts["warnings"] = len(warned)
+    counts["changed"] = cli.count_entries(new)
+    with cli.phase(counts, "write"), open(po + ".checked", "w") as fp:
+        master.output_po(
+            file=fp, raw=args.raw, msguniq=args.msguniq, formatted=watcher.formatted
+        )
+    for item in master:
+        cli.count_item(counts, item)
+    return counts
+
+
 #######################################################################
 if __name__ == "__main__":
     po_check()
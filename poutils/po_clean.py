@@ -29,6 +29,7 @@ import os  # for os.path.basename etc.
 
 # To test this in place, setup a symlink with "ln -sf . poutils"
 import poutils
+from poutils import cli
 
 #######################################################################
 # main program
@@ -60,21 +61,35 @@ def po_clean():
         default=False,
         help="raw output without uniq",
     )
-    p.add_argument("po", help="Input PO file name.  Output PO file suffix: .cleaned")
-    args = p.parse_args()
-    master = poutils.PotData()
-    with open(args.po, "r") as fp:
-        master.read_po(file=fp)
-    master.clean_msgstr(
-        pattern_extracted=r"<screen>",
-        pattern_msgid=r"^https?://",
-        keep_fuzzy=args.keep_fuzzy,
+    p.add_argument(
+        "-u",
+        "--msguniq",
+        action="store_true",
+        default=False,
+        help="use msguniq command instead of the built-in writer",
     )
-    with open(args.po + ".cleaned", "w") as fp:
-        master.output_po(file=fp, raw=args.raw)
+    cli.add_po_arguments(p, "Input PO file names.  Output PO file suffix: .cleaned")
+    args = p.parse_args()
+    cli.run_batch(name, po_clean_file, args)
     return
 
 
+def po_clean_file(po, args):
+    counts = cli.new_counts(po)
+    master = cli.read_po(po, args, counts=counts)
+    with cli.phase(counts, "transform"):
+        master.clean_msgstr(
+            pattern_extracted=r"<screen>",
+            pattern_msgid=r"^https?://",
+            keep_fuzzy=args.keep_fuzzy,
+        )
+    with cli.phase(counts, "write"), open(po + ".cleaned", "w") as fp:
+        master.output_po(file=fp, raw=args.raw, msguniq=args.msguniq)
+    for item in master:
+        cli.count_item(counts, item)
+    return counts
+
+
 #######################################################################
 if __name__ == "__main__":
     po_clean()
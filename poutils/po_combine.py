@@ -28,6 +28,8 @@ import sys  # sys.stderr etc.
 
 # To test this in place, setup a symlink with "ln -sf . poutils"
 import poutils
+from poutils import cache
+from poutils import cli
 
 #######################################################################
 # main program
@@ -146,7 +148,13 @@ to check the consistency.
   po_check -i <LANG>.po
 
 Use po_align to ensure easier matching (for po4a) and smooth operation of
-po_combine.  It is easier to debug source issues with po_align + po_combine.
+po_combine.  With -s, entries are paired by aligning the sequences of their
+extracted tag patterns and number of references, so a missing paragraph on
+either side is reported as an unmatched entry instead of shifting all the
+following pairs.  It is easier to debug source issues with po_align + po_combine.
+The alignment of each region between anchors is kept in the "align" cache, so
+running po_combine -s again after editing the POT files aligns only the edited
+regions, with the same result as the first run (see "poutils cache").
 
 When you have perfectly aligned data, the use of the native PO generation
 mechanism such as po4a-gettextize with -l option for po4a may have advantage
@@ -168,28 +176,60 @@ See {}(1) manpage for more.
         default=False,
         help="generate aligned but duplicated content for debug",
     )
+    p.add_argument(
+        "-s",
+        "--sequence",
+        action="store_true",
+        default=False,
+        help="pair entries by aligning extracted tag patterns instead of by position",
+    )
+    p.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="do not use the alignment cache of -s in {}".format(cache.cache_dir()),
+    )
+    p.add_argument(
+        "-u",
+        "--msguniq",
+        action="store_true",
+        default=False,
+        help="use msguniq command instead of the built-in writer",
+    )
     p.add_argument(
         "-v", "--verbose", action="store_true", default=False, help="verbose output"
     )
+    cli.add_parse_cache_argument(p)
+    cli.add_stats_arguments(p)
     p.add_argument("master_pot", help="Input POT file from the English source")
     p.add_argument("translated_pot", help="Input POT file from the translated source")
     p.add_argument("output", help="Output PO file")
     args = p.parse_args()
-    master = poutils.PotData()
-    translation = poutils.PotData()
-    with open(args.master_pot, "r") as fp_master_pot:
-        master.read_po(file=fp_master_pot, verbose=args.verbose)
-        with open(args.translated_pot, "r") as fp_translated_pot:
-            translation.read_po(file=fp_translated_pot)
-    master.normalize()
-    translation.normalize()
-    master.combine_pots(translation)
-    master.clean_msgstr(pattern_extracted=r"<screen>", pattern_msgid=r"^https?://")
-    with open(args.output, "w") as fp_output:
-        master.output_po(file=fp_output, aligned=args.aligned)
+    counts = cli.new_counts(args.output)
+    with cli.session(name, args, [counts]):
+        po_combine_file(counts, args)
     return
 
 
+def po_combine_file(counts, args):
+    master = cli.read_po(args.master_pot, args, verbose=args.verbose, counts=counts)
+    translation = cli.read_po(args.translated_pot, args, counts=counts)
+    with cli.phase(counts, "transform"):
+        master.normalize()
+        translation.normalize()
+        if args.sequence and not args.no_cache:
+            with cache.Cache("align") as c:
+                master.combine_pots(translation, align=True, cache=c)
+        else:
+            master.combine_pots(translation, align=args.sequence)
+        master.clean_msgstr(pattern_extracted=r"<screen>", pattern_msgid=r"^https?://")
+    with cli.phase(counts, "write"), open(args.output, "w") as fp_output:
+        master.output_po(file=fp_output, raw=args.aligned, msguniq=args.msguniq)
+    for item in master:
+        cli.count_item(counts, item)
+    return counts
+
+
 #######################################################################
 if __name__ == "__main__":
     po_combine()
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Copyright © 2018 Osamu Aoki
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the
+"Software"), to deal in the Software without restriction, including
+without limitation the rights to use, copy, modify, merge, publish,
+distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to
+the following conditions:
+
+The above copyright notice and this permission notice shall be included
+in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import argparse
+import os  # for os.path.basename etc.
+
+# To test this in place, setup a symlink with "ln -sf . poutils"
+import poutils
+from poutils import cli
+
+#######################################################################
+# main program
+#######################################################################
+def po_mo():
+    name = "po_mo"
+    p = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="""\
+{0}: compile PO files into GNU MO files as msgfmt  Version: {1}
+
+{2}
+""".format(
+            name, poutils.version, poutils.copyright
+        ),
+        epilog="""\
+ja.po is compiled into ja.mo with the hash table of msgfmt.  Untranslated,
+obsolete and fuzzy entries are skipped as "msgfmt -o ja.mo ja.po" does.
+Strings are written as UTF-8.
+""",
+    )
+    p.add_argument(
+        "-f",
+        "--use-fuzzy",
+        action="store_true",
+        default=False,
+        help="use fuzzy entries, too",
+    )
+    cli.add_po_arguments(p, "Input PO file names.  Output MO file suffix: .mo")
+    args = p.parse_args()
+    cli.run_batch(name, po_mo_file, args)
+    return
+
+
+def po_mo_file(po, args):
+    counts = cli.new_counts(po)
+    master = cli.read_po(po, args, counts=counts)
+    root, ext = os.path.splitext(po)
+    with cli.phase(counts, "write"):
+        with open((root if ext == ".po" else po) + ".mo", "wb") as fp:
+            master.write_mo(fp, use_fuzzy=args.use_fuzzy)
+    for item in master:
+        cli.count_item(counts, item)
+    return counts
+
+
+#######################################################################
+if __name__ == "__main__":
+    po_mo()
@@ -29,6 +29,7 @@ import shutil
 
 # To test this in place, setup a symlink with "ln -sf . poutils"
 import poutils
+from poutils import cli
 
 #######################################################################
 # main program
@@ -55,19 +56,38 @@ This revert the po file converted by the po_wdiff to the original state.
         default=False,
         help="keep original file as *.orig",
     )
-    p.add_argument("po", help="PO file")
+    p.add_argument(
+        "-u",
+        "--msguniq",
+        action="store_true",
+        default=False,
+        help="use msguniq command instead of the built-in writer",
+    )
+    cli.add_po_arguments(p, "PO file names.")
     args = p.parse_args()
-    master = poutils.PotData()
-    with open(args.po, "r") as fp:
-        master.read_po(file=fp)
-    master.previous_msgid()
-    if args.keep:
-        shutil.move(args.po, args.po + ".orig")
-    with open(args.po, "w") as fp:
-        master.output_po(file=fp)
+    cli.run_batch(name, po_previous_file, args)
     return
 
 
+def po_previous_file(po, args):
+    counts = cli.new_counts(po)
+
+    def transform(item):
+        item.previous_msgid()
+        cli.count_item(counts, item)
+
+    master = poutils.PotData()
+    with cli.phase(counts, "write"):
+        master.stream_po_inplace(
+            po,
+            cli.stream_transform(counts, args, transform),
+            keep=args.keep,
+            msguniq=args.msguniq,
+            items=cli.stream_items(po, args, counts),
+        )
+    return counts
+
+
 #######################################################################
 if __name__ == "__main__":
     po_previous()
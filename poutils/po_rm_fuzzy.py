@@ -29,6 +29,7 @@ import os  # for os.path.basename etc.
 
 # To test this in place, setup a symlink with "ln -sf . poutils"
 import poutils
+from poutils import cli
 
 #######################################################################
 # main program
@@ -47,18 +48,40 @@ def po_rm_fuzzy():
         epilog="See {}(1) manpage for more.".format(name),
     )
     p.add_argument(
-        "po", help="Input PO file name.  Output PO file suffix: .fuzzy_removed"
+        "-u",
+        "--msguniq",
+        action="store_true",
+        default=False,
+        help="use msguniq command instead of the built-in writer",
+    )
+    cli.add_po_arguments(
+        p, "Input PO file names.  Output PO file suffix: .fuzzy_removed"
     )
     args = p.parse_args()
-    master = poutils.PotData()
-    with open(args.po, "r") as fp:
-        master.read_po(file=fp)
-    master.rm_fuzzy_all()
-    with open(args.po + ".fuzzy_removed", "w") as fp:
-        master.output_po(file=fp)
+    cli.run_batch(name, po_rm_fuzzy_file, args)
     return
 
 
+def po_rm_fuzzy_file(po, args):
+    counts = cli.new_counts(po)
+
+    def transform(item):
+        item.rm_fuzzy()
+        cli.count_item(counts, item)
+
+    master = poutils.PotData()
+    with cli.phase(counts, "write"), open(po, "r") as fp_in:
+        with open(po + ".fuzzy_removed", "w") as fp:
+            master.stream_po(
+                fp_in,
+                fp,
+                cli.stream_transform(counts, args, transform),
+                msguniq=args.msguniq,
+                items=cli.stream_items(po, args, counts),
+            )
+    return counts
+
+
 #######################################################################
 if __name__ == "__main__":
     po_rm_fuzzy()
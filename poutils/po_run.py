@@ -0,0 +1,245 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Copyright © 2021 Osamu Aoki
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the
+"Software"), to deal in the Software without restriction, including
+without limitation the rights to use, copy, modify, merge, publish,
+distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to
+the following conditions:
+
+The above copyright notice and this permission notice shall be included
+in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import argparse
+import sys  # sys.stderr etc.
+
+# To test this in place, setup a symlink with "ln -sf . poutils"
+import poutils
+from poutils import cli
+from poutils import cache
+from poutils import diff
+
+#######################################################################
+# stages (PotData methods applied in memory)
+#######################################################################
+def stage_clean(master, args):
+    master.clean_msgstr(
+        pattern_extracted=r"<screen>",
+        pattern_msgid=r"^https?://",
+        keep_fuzzy=args.keep_fuzzy,
+    )
+    return 0
+
+
+def stage_check(master, args):
+    if args.no_cache:
+        return master.check_xml(
+            force_check=args.force_check, itstool=args.itstool, jobs=args.entry_jobs
+        )
+    with cache.Cache("check") as c:
+        return master.check_xml(
+            force_check=args.force_check,
+            itstool=args.itstool,
+            cache=c,
+            jobs=args.entry_jobs,
+        )
+
+
+def stage_wdiff(master, args):
+    if args.no_cache:
+        return master.wdiff_msgid(mode=args.mode, max_cost=args.max_cost)
+    with cache.Cache("wdiff") as c:
+        return master.wdiff_msgid(mode=args.mode, max_cost=args.max_cost, cache=c)
+
+
+stages = {
+    "clean": stage_clean,
+    "rm_fuzzy": lambda master, args: master.rm_fuzzy_all(),
+    "check": stage_check,
+    "wdiff": stage_wdiff,
+    "previous": lambda master, args: master.previous_msgid(),
+    "update": lambda master, args: master.update_msgstr(),
+    "normalize": lambda master, args: master.normalize(),
+}
+
+#######################################################################
+# main program
+#######################################################################
+def po_run():
+    name = "poutils"
+    p = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="""\
+{0}: apply many po_* operations with a single parse   Version: {1}
+
+{2}
+""".format(
+            name, poutils.version, poutils.copyright
+        ),
+        epilog="""\
+STAGES is a comma separated list of:
+
+  clean     as po_clean       rm_fuzzy  as po_rm_fuzzy
+  check     as po_check       wdiff     as po_wdiff
+  previous  as po_previous    update    as po_update
+  normalize normalize for po_combine
+
+E.g., "poutils run clean,rm_fuzzy,check ja.po" parses ja.po once, applies
+these in this order, and writes ja.po.processed once.  The time spent
+by parsing, each stage and writing is reported to stderr.
+
+"poutils cache stats" shows the hits and misses of the check and wdiff
+caches.  "poutils cache prune" removes all their entries, or only those
+unused for --days or beyond --max-entries.
+""",
+    )
+    sub = p.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("run", help="apply STAGES to PO files")
+    r.add_argument(
+        "-s",
+        "--suffix",
+        default=".processed",
+        help="output PO file suffix (default: .processed)",
+    )
+    r.add_argument(
+        "-f",
+        "--force_check",
+        action="store_true",
+        default=False,
+        help="check: force to check msgstr even for the fuzzy msgstr",
+    )
+    r.add_argument(
+        "-i",
+        "--itstool",
+        action="store_true",
+        default=False,
+        help="check: filter for itstool generated PO file",
+    )
+    r.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="check, wdiff: do not use the caches in {}".format(cache.cache_dir()),
+    )
+    r.add_argument(
+        "-k",
+        "--keep_fuzzy",
+        action="store_true",
+        default=False,
+        help="clean: keep all fuzzy markers",
+    )
+    r.add_argument(
+        "-m",
+        "--mode",
+        choices=diff.modes,
+        default="char",
+        help="wdiff: diff by characters (difflib) or by words (default: char)",
+    )
+    r.add_argument(
+        "--max-cost",
+        type=int,
+        default=diff.max_cost,
+        help="wdiff: word mode limit of edits per entry",
+    )
+    r.add_argument(
+        "-r",
+        "--raw",
+        action="store_true",
+        default=False,
+        help="raw output without uniq",
+    )
+    r.add_argument(
+        "-u",
+        "--msguniq",
+        action="store_true",
+        default=False,
+        help="use msguniq command instead of the built-in writer",
+    )
+    r.add_argument("stages", help="comma separated list of STAGES")
+    cli.add_po_arguments(r, "Input PO file names.")
+    c = sub.add_parser("cache", help="show statistics of or prune the caches")
+    actions = c.add_subparsers(dest="action", required=True)
+    names_help = "cache names (default: all in {})".format(cache.cache_dir())
+    stats = actions.add_parser("stats", help="show entries, hits and misses")
+    stats.add_argument("names", nargs="*", help=names_help)
+    prune = actions.add_parser("prune", help="remove cache entries")
+    prune.add_argument(
+        "--days",
+        type=float,
+        default=None,
+        help="remove entries unused for DAYS",
+    )
+    prune.add_argument(
+        "--max-entries",
+        type=int,
+        default=None,
+        help="keep at most MAX_ENTRIES recently used entries",
+    )
+    prune.add_argument("names", nargs="*", help=names_help)
+    args = p.parse_args()
+    if args.command == "cache":
+        po_cache(args)
+        return
+    args.stages = args.stages.split(",")
+    for stage in args.stages:
+        if stage not in stages:
+            r.error("unknown stage: {}".format(stage))
+    args.entry_jobs = cli.entry_jobs(args)
+    cli.run_batch(name + " run", po_run_file, args)
+    return
+
+
+def po_cache(args):
+    for name in args.names or cache.cache_names():
+        with cache.Cache(name) as c:
+            if args.action == "prune":
+                n = c.prune(max_entries=args.max_entries, days=args.days)
+                print("{}: {} entries removed".format(name, n))
+            stats = c.stats()
+        print(
+            "{}: {} entries, {} bytes, {} hits, {} misses".format(
+                name, stats["entries"], stats["bytes"], stats["hits"], stats["misses"]
+            )
+        )
+    return
+
+
+def po_run_file(po, args):
+    counts = cli.new_counts(po)
+    master = cli.read_po(po, args, counts=counts)
+    for stage in args.stages:
+        with cli.phase(counts, stage):
+            num_warn = stages[stage](master, args)
+        if num_warn:
+            counts["warnings"] += num_warn
+    with cli.phase(counts, "write"), open(po + args.suffix, "w") as fp:
+        master.output_po(file=fp, raw=args.raw, msguniq=args.msguniq)
+    for item in master:
+        cli.count_item(counts, item)
+    print(
+        "I: {}: {}".format(
+            po,
+            ", ".join(
+                "{} {:.3f}s".format(stage, t) for stage, t in counts["times"].items()
+            ),
+        ),
+        file=sys.stderr,
+    )
+    return counts
+
+
+#######################################################################
+if __name__ == "__main__":
+    po_run()
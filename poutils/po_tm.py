@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Copyright © 2021 Osamu Aoki
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the
+"Software"), to deal in the Software without restriction, including
+without limitation the rights to use, copy, modify, merge, publish,
+distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to
+the following conditions:
+
+The above copyright notice and this permission notice shall be included
+in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import argparse
+import sys  # sys.stderr etc.
+
+# To test this in place, setup a symlink with "ln -sf . poutils"
+import poutils
+from poutils import cli
+from poutils import tm
+
+#######################################################################
+# main program
+#######################################################################
+def po_tm():
+    name = "po_tm"
+    p = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="""\
+{0}: translation memory from translated PO files       Version: {1}
+
+{2}
+""".format(
+            name, poutils.version, poutils.copyright
+        ),
+        epilog="""\
+"po_tm load po/*.po" stores the translated and not fuzzy entries of PO
+files in the translation memory.  "po_tm apply new/*.po" fills empty
+msgstr of PO files with the stored translation of the same msgctxt and
+msgid (white space runs in msgid are treated as a space).  The language
+is taken from the "Language:" header, else from the file name (ja.po,
+ja.foo.po, ... are "ja"), unless -l is given.
+""",
+    )
+    p.add_argument(
+        "-d",
+        "--db",
+        default=None,
+        help="translation memory file (default: {}/tm.sqlite3)".format(tm.data_dir()),
+    )
+    sub = p.add_subparsers(dest="command", required=True)
+    load = sub.add_parser("load", help="store translations of PO files")
+    apply = sub.add_parser("apply", help="fill empty msgstr of PO files")
+    for q in (load, apply):
+        q.add_argument(
+            "-l", "--lang", default=None, help="language (default: from each PO file)"
+        )
+    apply.add_argument(
+        "-f",
+        "--fuzzy",
+        action="store_true",
+        default=False,
+        help="mark all filled entries fuzzy",
+    )
+    apply.add_argument(
+        "-k",
+        "--keep",
+        action="store_true",
+        default=False,
+        help="keep original file as *.orig",
+    )
+    apply.add_argument(
+        "-u",
+        "--msguniq",
+        action="store_true",
+        default=False,
+        help="use msguniq command instead of the built-in writer",
+    )
+    for q in (load, apply):
+        cli.add_po_arguments(q, "PO file names.")
+    sub.add_parser("stats", help="show the number of entries for each language")
+    args = p.parse_args()
+    if args.command == "stats":
+        with tm.TranslationMemory(args.db) as memory:
+            for lang, n in memory.stats().items():
+                print("{}: {} entries".format(lang, n))
+    elif args.command == "load":
+        cli.run_batch(name + " load", load_file, args)
+    else:
+        cli.run_batch(name + " apply", apply_file, args)
+    return
+
+
+def load_file(po, args):
+    counts = cli.new_counts(po)
+    master = cli.read_po(po, args, counts=counts)
+    with cli.phase(counts, "transform"), tm.TranslationMemory(args.db) as memory:
+        counts["entries"] = memory.load(master, args.lang or tm.language(master, po))
+    return counts
+
+
+def apply_file(po, args):
+    counts = cli.new_counts(po)
+    master = cli.read_po(po, args, counts=counts)
+    with cli.phase(counts, "transform"), tm.TranslationMemory(args.db) as memory:
+        num = memory.apply(
+            master, args.lang or tm.language(master, po), fuzzy=args.fuzzy
+        )
+    if num:
+        with cli.phase(counts, "write"):
+            master.output_po_inplace(po, keep=args.keep, msguniq=args.msguniq)
+    for item in master:
+        cli.count_item(counts, item)
+    print("I: {}: {} entries filled".format(po, num), file=sys.stderr)
+    return counts
+
+
+#######################################################################
+if __name__ == "__main__":
+    po_tm()
@@ -29,6 +29,8 @@ import shutil
 
 # To test this in place, setup a symlink with "ln -sf . poutils"
 import poutils
+from poutils import cli
+from poutils import suggest
 
 #######################################################################
 # main program
@@ -44,7 +46,14 @@ def po_update():
 """.format(
             name, poutils.version, poutils.copyright
         ),
-        epilog="See {}(1) manpage for more.".format(name),
+        epilog="""\
+With "-s ja.po", an untranslated msgid gets the msgstr of the most similar
+translated msgid in ja.po as a fuzzy msgstr with its "#| msgid".  The
+similarity is the Jaccard index of their character trigrams.
+
+See {}(1) manpage for more.""".format(
+            name
+        ),
     )
     p.add_argument(
         "-k",
@@ -53,19 +62,84 @@ def po_update():
         default=False,
         help="keep original file as *.orig",
     )
-    p.add_argument("po", help="PO file")
+    p.add_argument(
+        "-u",
+        "--msguniq",
+        action="store_true",
+        default=False,
+        help="use msguniq command instead of the built-in writer",
+    )
+    p.add_argument(
+        "-s",
+        "--suggest",
+        action="append",
+        default=[],
+        metavar="PO",
+        help="suggest fuzzy msgstr from translated entries of PO (repeatable)",
+    )
+    p.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=suggest.threshold,
+        help="minimum similarity of suggestions (default: {})".format(
+            suggest.threshold
+        ),
+    )
+    cli.add_po_arguments(p, "PO file names.")
     args = p.parse_args()
-    master = poutils.PotData()
-    with open(args.po, "r") as fp:
-        master.read_po(file=fp)
-    master.update_msgstr()
-    if args.keep:
-        shutil.move(args.po, args.po + ".orig")
-    with open(args.po, "w") as fp:
-        master.output_po(file=fp)
+    if not 0 < args.threshold <= 1:
+        p.error("threshold must be in (0, 1]")
+    # the index is built once and passed to the worker processes
+    prepare = suggest_index if args.suggest else None
+    cli.run_batch(name, po_update_file, args, prepare=prepare)
     return
 
 
+def suggest_index(args):
+    """
+    Return the suggest.new_index() of the PO files of --suggest
+    """
+    index = suggest.new_index()
+    files = cli.expand_po(args.suggest)
+    for po in files:
+        index.add_po(cli.read_po(po, args))
+    index.build()
+    print(
+        "I: po_update: {} translated entries in {} files".format(
+            len(index), len(files)
+        ),
+        file=sys.stderr,
+    )
+    return index
+
+
+def po_update_file(po, args):
+    counts = cli.new_counts(po)
+    index = cli.prepared() if args.suggest else None
+
+    def transform(item):
+        item.update_msgstr()
+        cli.count_item(counts, item)
+
+    master = poutils.PotData()
+    with cli.phase(counts, "write"):
+        items = cli.stream_items(po, args, counts, parse=index is not None)
+        if index is not None:
+            # matches are searched for a batch of entries at once
+            items = index.fill_items(items, threshold=args.threshold)
+            if args.stats:
+                items = cli.timed_items(counts, "transform", items)
+        master.stream_po_inplace(
+            po,
+            cli.stream_transform(counts, args, transform),
+            keep=args.keep,
+            msguniq=args.msguniq,
+            items=items,
+        )
+    return counts
+
+
 #######################################################################
 if __name__ == "__main__":
     po_update()
@@ -23,12 +23,17 @@ TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 import argparse
+import io
 import os  # for os.path.basename etc.
 import sys  # sys.stderr etc.
 import shutil
 
 # To test this in place, setup a symlink with "ln -sf . poutils"
 import poutils
+from poutils import cli
+from poutils import cache
+from poutils import diff
+from poutils import watch
 
 #######################################################################
 # main program
@@ -67,19 +72,110 @@ using the "po_previous" command.
         default=False,
         help="keep original file as *.orig",
     )
-    p.add_argument("po", help="PO file")
+    p.add_argument(
+        "-m",
+        "--mode",
+        choices=diff.modes,
+        default="char",
+        help="diff by characters (difflib) or by words (default: char)",
+    )
+    p.add_argument(
+        "--max-cost",
+        type=int,
+        default=diff.max_cost,
+        help="word mode: replace the whole msgid beyond this number of edits",
+    )
+    p.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="do not use the diff cache in {}".format(cache.cache_dir()),
+    )
+    p.add_argument(
+        "-u",
+        "--msguniq",
+        action="store_true",
+        default=False,
+        help="use msguniq command instead of the built-in writer",
+    )
+    cli.add_watch_arguments(p)
+    cli.add_po_arguments(p, "PO file names.")
     args = p.parse_args()
-    master = poutils.PotData()
-    with open(args.po, "r") as fp:
-        master.read_po(file=fp)
-    master.wdiff_msgid()
-    if args.keep:
-        shutil.move(args.po, args.po + ".orig")
-    with open(args.po, "w") as fp:
-        master.output_po(file=fp)
+    if args.watch:
+        if args.keep:
+            p.error("--keep can not be used with --watch")
+        cli.run_watch(name, po_wdiff_watch, args)
+    else:
+        cli.run_batch(name, po_wdiff_file, args)
     return
 
 
+def po_wdiff_file(po, args):
+    counts = cli.new_counts(po)
+    c = None if args.no_cache else cache.Cache("wdiff")
+
+    def transform(item):
+        item.wdiff_msgid(mode=args.mode, max_cost=args.max_cost, cache=c)
+        cli.count_item(counts, item)
+
+    master = poutils.PotData()
+    try:
+        with cli.phase(counts, "write"):
+            master.stream_po_inplace(
+                po,
+                cli.stream_transform(counts, args, transform),
+                keep=args.keep,
+                msguniq=args.msguniq,
+                items=cli.stream_items(po, args, counts),
+            )
+    finally:
+        if c is not None:
+            c.close()
+    return counts
+
+
+def po_wdiff_watch(po, args, watcher):
+    """
+    Add wdiff to only the entries changed since the last run of --watch
+
+    The PO file is rewritten only if its content changes and it was not
+    saved again meanwhile.
+    """
+    counts = cli.new_counts(po)
+    c = None if args.no_cache else cache.Cache("wdiff")
+
+    def transform(items):
+        with cli.phase(counts, "transform"):
+            for item in items:
+                item.wdiff_msgid(mode=args.mode, max_cost=args.max_cost, cache=c)
+
+    try:
+        with cli.phase(counts, "parse"):
+            master, new = watcher.read(transform)
+    finally:
+        if c is not None:
+            c.close()
+    counts["changed"] = cli.count_entries(new)
+    with cli.phase(counts, "write"):
+        if args.msguniq:
+            text = None
+        else:
+            fp = io.StringIO()
+            master.output_po(file=fp, formatted=watcher.formatted)
+            text = fp.getvalue()
+        if watch.stamp(po) != watcher.stamp:
+            pass  # saved again: processed at the next poll
+        elif text is None:
+            master.output_po_inplace(po, msguniq=True)
+            watcher.stamp = watch.stamp(po)
+        elif text.encode("utf-8") != watcher.data:
+            master.rewrite_po(po, lambda fp_in, fp_out: fp_out.write(text))
+            watcher.stamp = watch.stamp(po)
+    for item in master:
+        cli.count_item(counts, item)
+    return counts
+
+
 #######################################################################
 if __name__ == "__main__":
     po_wdiff()
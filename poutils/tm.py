@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Copyright © 2021 Osamu Aoki
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the
+"Software"), to deal in the Software without restriction, including
+without limitation the rights to use, copy, modify, merge, publish,
+distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to
+the following conditions:
+
+The above copyright notice and this permission notice shall be included
+in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+Translation memory in SQLite built from translated PO files
+"""
+import hashlib
+import os  # for os.path.basename etc.
+import re
+import sqlite3
+
+#######################################################################
+# Translation memory
+#######################################################################
+def data_dir():
+    """
+    Return the poutils data directory ($XDG_DATA_HOME/poutils)
+    """
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(
+        os.path.expanduser("~"), ".local", "share"
+    )
+    return os.path.join(base, "poutils")
+
+
+re_language = re.compile(r"(?:^|\\n)Language: *([^\\]*?) *\\n")
+
+
+def language(master, path=None):
+    """
+    Return the language of PotData from the header or else the file name
+    """
+    for item in master:
+        if item.msgid == "" and len(item.obsolete) == 0:
+            m = re_language.search(item.msgstr)
+            if m and m.group(1):
+                return m.group(1)
+            break
+    if path:
+        return os.path.basename(path).split(".")[0]
+    return ""
+
+
+def normalize(msgid):
+    """
+    Return msgid with white space runs collapsed into a space
+    """
+    return " ".join(msgid.split())
+
+
+class TranslationMemory:
+    """
+    msgstr of translated entries keyed on language, msgctxt and the
+    normalized msgid
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(data_dir(), "tm.sqlite3")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS tm (lang TEXT, key BLOB, msgid TEXT, "
+            "msgstr TEXT, PRIMARY KEY (lang, key)) WITHOUT ROWID"
+        )
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+        return
+
+    @staticmethod
+    def key(msgctxt, msgid):
+        data = (msgctxt + "\0" + normalize(msgid)).encode("utf-8")
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def load(self, master, lang):
+        """
+        Store translated (not fuzzy) entries of PotData for lang
+
+        Return the number of entries stored.
+        """
+        rows = [
+            (lang, self.key(item.msgctxt, item.msgid), item.msgid, item.msgstr)
+            for item in master
+            if item.msgid != ""
+            and item.msgstr != ""
+            and len(item.obsolete) == 0
+            and not item.is_fuzzy()
+        ]
+        rows.sort()  # insert in the order of the primary key
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO tm VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def apply(self, master, lang, fuzzy=False):
+        """
+        Fill empty msgstr of PotData from the memory for lang in one query
+
+        Filled entries are marked fuzzy if fuzzy is True or msgid differs
+        in white spaces.  Return the number of entries filled.
+        """
+        todo = {}
+        for item in master:
+            if item.msgid != "" and item.msgstr == "" and len(item.obsolete) == 0:
+                todo.setdefault(self.key(item.msgctxt, item.msgid), []).append(item)
+        if not todo:
+            return 0
+        with self.db:
+            self.db.execute("CREATE TEMP TABLE IF NOT EXISTS query (key BLOB)")
+            self.db.execute("DELETE FROM query")
+            self.db.executemany("INSERT INTO query VALUES (?)", ((k,) for k in todo))
+            rows = self.db.execute(
+                "SELECT tm.key, tm.msgid, tm.msgstr FROM query "
+                "JOIN tm ON tm.lang = ? AND tm.key = query.key",
+                (lang,),
+            ).fetchall()
+        num = 0
+        for key, msgid, msgstr in rows:
+            for item in todo[key]:
+                item.msgstr = msgstr
+                if fuzzy or msgid != item.msgid:
+                    item.add_fuzzy()
+                num += 1
+        master.invalidate()
+        return num
+
+    def stats(self):
+        """
+        Return a dict of the number of entries for each language
+        """
+        return dict(
+            self.db.execute("SELECT lang, COUNT(*) FROM tm GROUP BY lang ORDER BY lang")
+        )
@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Copyright © 2021 Osamu Aoki
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the
+"Software"), to deal in the Software without restriction, including
+without limitation the rights to use, copy, modify, merge, publish,
+distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so, subject to
+the following conditions:
+
+The above copyright notice and this permission notice shall be included
+in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Watch a PO file and parse again only the entries changed by each save
+"""
+import io
+import os  # for os.path.basename etc.
+
+import poutils
+
+
+def stamp(path):
+    """
+    Return (mtime, size) of path, or None if it is missing
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class Watcher:
+    """
+    PO file polled by mtime and size, keeping the entries of the last read
+
+    Each read splits the file into the blocks of lines between blank
+    lines (see PotData.iter_po_spans()).  The PotItems of a block with
+    the same content (the dict key) as in the last read are reused as
+    they were left by transform.  Only the other blocks are parsed and
+    transformed, so the work done for a save is proportional to the edit
+    except for splitting the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.stamp = None
+        self.seen = None  # stamp at the last poll
+        self.data = b""  # content of the last read
+        self.blocks = {}  # (Line.INITIAL or Line.BLANK, bytes) -> PotItems
+        self.formatted = {}  # see PotData.write_uniq()
+        self.state = {}  # kept for the command between the reads
+        return
+
+    def changed(self):
+        """
+        Return True if the file was saved since the last read
+
+        A new stamp must be seen by two polls in a row, so a file still
+        being written is not read half way.
+        """
+        s = stamp(self.path)
+        seen = self.seen
+        self.seen = s
+        return s is not None and s != self.stamp and s == seen
+
+    def read(self, transform=None):
+        """
+        Read the file and return (PotData of all items, list of new items)
+
+        transform is called with the list of new items (parsed from blocks
+        not in the last read) before they are kept.  If the file has an
+        illegal line, it is read again by PotData.iter_po() as
+        cli.read_po() does, which reports the line and goes on.  Then all
+        items are new and no block is kept for the next read.
+        """
+        self.stamp = stamp(self.path)
+        with open(self.path, "rb") as fp:
+            data = fp.read()
+        parser = poutils.PotData()
+        master = poutils.PotData()
+        blocks = {}
+        new = []
+        try:
+            for start, end, type, lineno in parser.iter_po_spans(data):
+                key = (type, data[start:end])
+                items = blocks.get(key)
+                if items is None:
+                    items = self.blocks.get(key)
+                if items is None:
+                    items = list(
+                        parser.iter_po_bytes(
+                            data, start=start, end=end, type=type, lineno=lineno
+                        )
+                    )
+                    new.extend(items)
+                blocks[key] = items
+                master.items.extend(items)
+        except poutils.PoParseError:
+            master = poutils.PotData()  # items parsed before the error
+            master.read_po(file=io.TextIOWrapper(io.BytesIO(data)))
+            blocks = {}
+            new = list(master.items)
+        if transform is not None and new:
+            transform(new)
+        self.data = data
+        self.blocks = blocks
+        return master, new
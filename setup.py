@@ -83,6 +83,10 @@ setuptools.setup(
         "Operating System :: POSIX :: Linux",
         "Topic :: Utilities",
     ],
+    extras_require={
+        # poutils.columns and po_update --suggest are faster with NumPy
+        "numpy": ["numpy"],
+    },
     entry_points={
         "console_scripts": [
             "po_align=poutils.po_align:po_align",
@@ -93,6 +97,9 @@ setuptools.setup(
             "po_update=poutils.po_update:po_update",
             "po_wdiff=poutils.po_wdiff:po_wdiff",
             "po_previous=poutils.po_previous:po_previous",
+            "po_tm=poutils.po_tm:po_tm",
+            "po_mo=poutils.po_mo:po_mo",
+            "poutils=poutils.po_run:po_run",
         ],
     },
     cmdclass={"distclean": distclean, "deb": deb},
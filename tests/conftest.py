@@ -0,0 +1,8 @@
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+pytest configuration: import poutils from this source tree
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,31 @@
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Versions of the cached data
+"""
+import os
+import shutil
+
+import poutils
+from poutils import cache
+
+data_dir = os.path.join(os.path.dirname(__file__), "data", "parse")
+
+
+def test_version_key(monkeypatch):
+    keys = {name: cache.version_key(poutils.version, name) for name in cache.formats}
+    assert keys == poutils.cache_versions
+    assert len(set(keys.values())) == len(keys)
+    assert cache.version_key("0.4", "check") != keys["check"]
+    monkeypatch.setitem(cache.formats, "check", cache.formats["check"] + 1)
+    assert cache.version_key(poutils.version, "check") != keys["check"]
+
+
+def test_sidecar_of_other_format(tmp_path, monkeypatch):
+    path = str(tmp_path / "ja.po")
+    shutil.copy(os.path.join(data_dir, "multiline.po"), path)
+    poutils.PotData().read_po_cached(path)
+    data, stamp = cache.read_sidecar(path, poutils.cache_versions["parse"])
+    assert data is not None
+    monkeypatch.setitem(cache.formats, "parse", cache.formats["parse"] + 1)
+    data, stamp = cache.read_sidecar(path, cache.version_key(poutils.version, "parse"))
+    assert data is None
@@ -0,0 +1,117 @@
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Columns bulk operations against the PotData loops
+"""
+import io
+
+import pytest
+
+import poutils
+from poutils import columns
+
+po = """\
+msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=UTF-8\\n"
+
+#. type: Content of: <book><para>
+#, fuzzy
+msgid "same"
+msgstr "same"
+
+#. type: Content of: <book><screen>
+msgid "ls -l"
+msgstr "ls -l"
+
+#. type: Content of: <book><para>
+#. type: Content of: <book><screen>
+#, fuzzy, c-format
+msgid "two %d"
+msgstr "two %d"
+
+#. type: Content of: <book><para>
+#, fuzzy
+msgid "https://example.org/"
+msgstr "https://example.org/"
+
+#. type: Content of: <book><ulink>
+msgid "http://example.org/"
+msgstr ""
+
+#. type: Content of: <book><screen>
+#, fuzzy
+msgid "cd /tmp"
+msgstr "cd"
+
+#, fuzzy
+msgid "other"
+msgstr "autre"
+
+msgid "plain"
+msgstr "plain"
+"""
+
+options = [
+    {},
+    {"pattern_extracted": r"<screen>"},
+    {"pattern_msgid": r"^https?://"},
+    {"pattern_extracted": r"<screen>", "pattern_msgid": r"^https?://"},
+]
+
+
+@pytest.fixture(params=["numpy", "list"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        if columns.numpy is None:
+            pytest.skip("NumPy is not installed")
+    else:
+        monkeypatch.setattr(columns, "numpy", None)
+    return request.param
+
+
+def parse():
+    master = poutils.PotData()
+    master.read_po(file=io.StringIO(po))
+    return master
+
+
+def text(master):
+    fp = io.StringIO()
+    master.output_raw(file=fp)
+    return fp.getvalue()
+
+
+@pytest.mark.parametrize("kwargs", options)
+@pytest.mark.parametrize("keep", [False, True])
+def test_clean_msgstr(backend, kwargs, keep):
+    expected = parse()
+    expected.clean_msgstr(keep_fuzzy=keep, **kwargs)
+    master = parse()
+    columns.Columns(master).clean_msgstr(keep_fuzzy=keep, **kwargs)
+    assert text(master) == text(expected)
+
+
+@pytest.mark.parametrize("kwargs", options)
+@pytest.mark.parametrize("rm_fuzzy", [False, True])
+def test_dup_msgstr(backend, kwargs, rm_fuzzy):
+    expected = parse()
+    expected.dup_msgstr(rm_fuzzy=rm_fuzzy, **kwargs)
+    master = parse()
+    columns.Columns(master).dup_msgstr(rm_fuzzy=rm_fuzzy, **kwargs)
+    assert text(master) == text(expected)
+
+
+def test_repeated_operations(backend):
+    expected = parse()
+    expected.dup_msgstr(pattern_msgid=r"^https?://", rm_fuzzy=False)
+    expected.clean_msgstr(pattern_extracted=r"<screen>")
+    expected.rm_fuzzy_all()
+    master = parse()
+    view = columns.Columns(master)
+    view.dup_msgstr(pattern_msgid=r"^https?://", rm_fuzzy=False)
+    view.clean_msgstr(pattern_extracted=r"<screen>")
+    view.rm_fuzzy_all()
+    assert text(master) == text(expected)
+    assert list(view.msgstr) == [item.msgstr for item in master]
+    assert not any(view.fuzzy)
+    assert master.find("two %d").msgstr == "two %d"
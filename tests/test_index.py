@@ -0,0 +1,34 @@
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+PotData lookup indexes
+"""
+import io
+
+import poutils
+
+po = """\
+#: src/a.c:10 src/b.c:20
+#: src/noline.c
+msgid "one"
+msgstr "un"
+
+#: src/a.c:10
+msgid "two"
+msgstr "deux"
+"""
+
+
+def test_by_reference():
+    master = poutils.PotData()
+    master.read_po(file=io.StringIO(po))
+    # as po_combine marks a mismatch (added before the index is built)
+    master.items[0].add_line("reference", "# WARN: mismatched references: 3 --> 2")
+    assert [item.msgid for item in master.by_reference("src/a.c:10")] == [
+        "one",
+        "two",
+    ]
+    assert [item.msgid for item in master.by_reference("src/b.c:20")] == ["one"]
+    assert [item.msgid for item in master.by_reference("src/noline.c")] == ["one"]
+    assert master.by_reference("mismatched") == []
+    assert master.by_reference("references:") == []
+    assert master.by_reference("-->") == []
@@ -0,0 +1,56 @@
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+In-place rewrites of PO files (PotData.stream_po_inplace) with -k
+"""
+import os
+import shutil
+import sys
+
+import pytest
+
+import poutils
+from poutils import po_update
+
+data_dir = os.path.join(os.path.dirname(__file__), "data", "parse")
+
+
+def copy_data(tmp_path, name):
+    path = str(tmp_path / "ja.po")
+    shutil.copy(os.path.join(data_dir, name), path)
+    with open(path, "rb") as fp:
+        return path, fp.read()
+
+
+def test_keep(tmp_path):
+    path, data = copy_data(tmp_path, "multiline.po")
+    os.chmod(path, 0o640)
+    poutils.PotData().stream_po_inplace(path, poutils.PotItem.rm_fuzzy, keep=True)
+    with open(path + ".orig", "rb") as fp:
+        assert fp.read() == data
+    with open(path, "rb") as fp:
+        assert b"#, fuzzy" not in fp.read()
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert sorted(os.listdir(tmp_path)) == ["ja.po", "ja.po.orig"]
+
+
+@pytest.mark.parametrize("keep", [False, True])
+def test_unparsable_file_is_kept(tmp_path, keep):
+    path, data = copy_data(tmp_path, "utf8.po")
+    with pytest.raises(UnicodeDecodeError):
+        poutils.PotData().stream_po_inplace(
+            path, poutils.PotItem.rm_fuzzy, keep=keep
+        )
+    with open(path, "rb") as fp:
+        assert fp.read() == data
+    assert os.listdir(tmp_path) == ["ja.po"]
+
+
+def test_po_update_keep_unparsable_file(tmp_path, monkeypatch):
+    path, data = copy_data(tmp_path, "utf8.po")
+    monkeypatch.setattr(sys, "argv", ["po_update", "-k", path])
+    with pytest.raises(SystemExit) as err:
+        po_update.po_update()
+    assert err.value.code == 1
+    with open(path, "rb") as fp:
+        assert fp.read() == data
+    assert os.listdir(tmp_path) == ["ja.po"]
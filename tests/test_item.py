@@ -0,0 +1,55 @@
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+PotItem list fields and flag handling
+"""
+import io
+
+import pytest
+
+import poutils
+
+po = """\
+#, c-format
+msgid "%d file"
+msgstr "%d fichier"
+"""
+
+
+def test_add_line():
+    item = poutils.PotItem()
+    other = poutils.PotItem()
+    with pytest.raises(AttributeError):
+        item.comment.append("# comment")
+    item.add_line("comment", "# comment")
+    item.add_line("comment", "# more")
+    item.obsolete = ['#~ msgid "a"']
+    assert item.comment == ["# comment", "# more"]
+    assert len(other.comment) == 0 and len(other.obsolete) == 0
+
+
+def test_add_fuzzy(capsys):
+    master = poutils.PotData()
+    master.read_po(file=io.StringIO(po))
+    item = master.items[0]
+    item.add_fuzzy()
+    assert item.flag == ["#, fuzzy, c-format"]
+    assert item.is_fuzzy()
+    item.add_fuzzy()
+    assert item.flag == ["#, fuzzy, c-format"]
+    assert capsys.readouterr().out == ""
+
+
+def test_flags_follow_flag():
+    master = poutils.PotData()
+    master.read_po(file=io.StringIO(po))
+    item = master.items[0]
+    assert item.flags == {"c-format"}
+    item.flag = ["#, fuzzy", "#, no-wrap"]
+    assert item.flags == {"fuzzy", "no-wrap"}
+    assert item.is_fuzzy()
+    item.flag[0] = "#, c-format"
+    assert not item.is_fuzzy()
+    item.rm_flag("no-wrap")
+    assert item.flag == ["#, c-format"] and item.flags == {"c-format"}
+    item.flag = []
+    assert item.flags == frozenset()
@@ -0,0 +1,161 @@
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+MO writer and reader against MO files compiled by msgfmt
+"""
+import codecs
+import glob
+import gettext
+import io
+import os
+import struct
+import sys
+
+import pytest
+
+import poutils
+from poutils import mo
+
+data_dir = os.path.join(os.path.dirname(__file__), "data", "mo")
+
+# msgfmt writes MO files in the native byte order
+little_endian = pytest.mark.skipif(
+    sys.byteorder != "little", reason="MO fixtures are little endian"
+)
+
+
+def read_data(name):
+    with open(os.path.join(data_dir, name), "rb") as fp:
+        return fp.read()
+
+
+def read_pairs(name):
+    """
+    Return the (key, value) pairs of a PO file with plural forms as
+    msgfmt stores them
+    """
+    entries = []
+    field = None
+    for line in read_data(name).splitlines():
+        if line[:1] == b'"':
+            entry[field] += codecs.escape_decode(line[1:-1])[0]
+            continue
+        if line[:1] in (b"", b"#"):
+            field = None
+            continue
+        keyword, value = line.split(b" ", 1)
+        keyword = keyword.decode()
+        if field is None:
+            entry = {}
+            entries.append(entry)
+        field = keyword
+        entry[field] = codecs.escape_decode(value[1:-1])[0]
+    pairs = []
+    for entry in entries:
+        key = entry["msgid"]
+        if "msgctxt" in entry:
+            key = entry["msgctxt"] + b"\x04" + key
+        if "msgid_plural" in entry:
+            key += b"\0" + entry["msgid_plural"]
+            forms = sorted(k for k in entry if k.startswith("msgstr["))
+            value = b"\0".join(entry[k] for k in forms)
+        else:
+            value = entry["msgstr"]
+        if value:
+            pairs.append((key, value))
+    return pairs
+
+
+def write(pairs, **kwargs):
+    fp = io.BytesIO()
+    mo.write(fp, pairs, **kwargs)
+    return fp.getvalue()
+
+
+@little_endian
+def test_write_no_hash():
+    assert write(read_pairs("gnu.po"), no_hash=True) == read_data("gnu.mo")
+
+
+@little_endian
+def test_write_hash_table():
+    assert write(read_pairs("ie.po")) == read_data("ie.mo")
+    assert write(read_pairs("mmo.po")) == read_data("mmo.mo")
+
+
+@little_endian
+def test_write_mo():
+    master = poutils.PotData()
+    with open(os.path.join(data_dir, "mmo.po"), "r", encoding="latin-1") as fp:
+        master.read_po(file=fp)
+    fp = io.BytesIO()
+    assert master.write_mo(fp) == 1
+    assert fp.getvalue() == read_data("mmo.mo")
+
+
+@pytest.mark.parametrize("name", ["gnu", "ie"])
+def test_find(name, tmp_path):
+    pairs = sorted(read_pairs(name + ".po"))
+    path = tmp_path / (name + ".mo")
+    path.write_bytes(write(pairs))
+    with mo.MoFile(os.path.join(data_dir, name + ".mo")) as compiled, mo.MoFile(
+        str(path)
+    ) as written:
+        assert written.hash_size > 2
+        for n, (key, value) in enumerate(pairs):
+            msgid = key.partition(b"\0")[0]
+            for f in (compiled, written):
+                assert f.find(key) == n
+                assert f.find(msgid) == n
+                assert f.find_hashed(key) == n
+                assert f.find_hashed(msgid) == n
+                assert f.find_hashed(msgid + b"x") == -1
+
+
+def test_lookup(tmp_path):
+    path = tmp_path / "ie.mo"
+    path.write_bytes(write(read_pairs("ie.po")))
+    with open(path, "rb") as fp:
+        catalog = gettext.GNUTranslations(fp)
+    with mo.MoFile(str(path)) as f:
+        assert len(f) == len(read_pairs("ie.po"))
+        for msgctxt, msgid, msgstr in f:
+            msgid, nul, plural = msgid.partition("\0")
+            assert f.lookup(msgid, msgctxt) == msgstr
+            forms = msgstr.split("\0")
+            if nul and msgctxt:
+                assert catalog.npgettext(msgctxt, msgid, plural, 1) == forms[0]
+                assert catalog.npgettext(msgctxt, msgid, plural, 2) == forms[1]
+            elif nul:
+                assert catalog.ngettext(msgid, plural, 1) == forms[0]
+                assert catalog.ngettext(msgid, plural, 2) == forms[1]
+            elif msgctxt:
+                assert catalog.pgettext(msgctxt, msgid) == msgstr
+            elif msgid:
+                assert catalog.gettext(msgid) == msgstr
+        assert f.lookup("no such msgid") is None
+
+
+def system_mo(limit=300):
+    paths = sorted(glob.glob("/usr/share/locale/*/LC_MESSAGES/*.mo"))
+    return paths[:: max(len(paths) // limit, 1)]
+
+
+@pytest.mark.skipif(not system_mo(), reason="no MO files in /usr/share/locale")
+def test_system_mo():
+    # revision 1 files with system dependent strings are not written
+    header = "<II" if sys.byteorder == "little" else ">II"
+    checked = 0
+    for path in system_mo():
+        with open(path, "rb") as fp:
+            if struct.unpack_from(header, fp.read(8)) != (mo.magic, 0):
+                continue
+        with mo.MoFile(path) as f:
+            pairs = [
+                (f._string(f.orig_offset, n), f._string(f.trans_offset, n))
+                for n in range(len(f))
+            ]
+        data = write(pairs, no_hash=f.hash_size == 0)
+        with open(path, "rb") as fp:
+            assert data == fp.read(), path
+        checked += 1
+    assert checked > 0
@@ -0,0 +1,135 @@
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Parallel PO parser (PotData.read_po_parallel) against the serial ones
+"""
+import argparse
+import os
+import shutil
+
+import pytest
+
+import poutils
+from poutils import cli
+from poutils import po_check
+
+data_dir = os.path.join(os.path.dirname(__file__), "data", "parse")
+valid = ["multiline", "obsolete", "crlf", "blank"]
+
+args = argparse.Namespace(
+    force_check=False,
+    itstool=False,
+    no_cache=True,
+    entry_jobs=1,
+    raw=False,
+    msguniq=False,
+    parse_cache=False,
+    profile=None,
+)
+
+
+def path_of(name):
+    return os.path.join(data_dir, name + ".po")
+
+
+def fields(items):
+    return [
+        (
+            list(item.comment),
+            list(item.extracted),
+            list(item.reference),
+            item.number_ref,
+            list(item.flag),
+            item.flags,
+            item.pmsgid,
+            item.msgctxt,
+            item.msgid,
+            item.msgstr,
+            list(item.obsolete),
+        )
+        for item in items
+    ]
+
+
+def read_text(path):
+    master = poutils.PotData()
+    with open(path, "r") as fp:
+        master.read_po(file=fp)
+    return master
+
+
+def read_mmap(path):
+    master = poutils.PotData()
+    with open(path, "rb") as fp:
+        master.read_po_mmap(fp)
+    return master
+
+
+def read_parallel(path, chunk):
+    master = poutils.PotData()
+    master.read_po_parallel(path, jobs=2, chunk=chunk)
+    return master
+
+
+@pytest.mark.parametrize("name", valid)
+def test_every_split(name):
+    # each blank line becomes the end of a part for some size
+    with open(path_of(name), "rb") as fp:
+        data = fp.read()
+    parser = poutils.PotData()
+    expected = fields(parser.iter_po_bytes(data))
+    assert len(list(parser.iter_po_spans(data, size=1))) > 10
+    for size in range(0, len(data) + 16, 16):
+        items = []
+        for span in parser.iter_po_spans(data, size=size):
+            items.extend(parser.iter_po_bytes(data, *span))
+        assert fields(items) == expected, size
+
+
+@pytest.mark.parametrize("name", valid)
+@pytest.mark.parametrize("chunk", [1, 300, 1 << 20])
+def test_parallel_items(name, chunk):
+    path = path_of(name)
+    expected = fields(read_text(path))
+    assert fields(read_mmap(path)) == expected
+    assert fields(read_parallel(path, chunk)) == expected
+
+
+@pytest.mark.parametrize("name", ["illegal", "utf8"])
+def test_parallel_error(name):
+    path = path_of(name)
+    with pytest.raises(poutils.PoParseError) as serial:
+        read_mmap(path)
+    with pytest.raises(poutils.PoParseError) as parallel:
+        read_parallel(path, 64)
+    assert serial.value.lineno > 100
+    assert (parallel.value.lineno, parallel.value.line) == (
+        serial.value.lineno,
+        serial.value.line,
+    )
+
+
+@pytest.mark.parametrize("chunk", [64, 1 << 20])
+def test_jobs_error_policy(tmp_path, monkeypatch, capsys, chunk):
+    # an illegal line is reported and skipped with -j as without it
+    monkeypatch.setattr(poutils.PotData.read_po_parallel, "__defaults__", (None, chunk))
+    path = str(tmp_path / "illegal.po")
+    shutil.copy(path_of("illegal"), path)
+    results = []
+    for jobs in (1, 2):
+        args.po = [path]
+        args.jobs = jobs
+        counts = po_check.po_check_file(path, args)
+        with open(path + ".checked") as fp:
+            results.append((counts["entries"], capsys.readouterr().out, fp.read()))
+    assert "ERROR" in results[0][1]
+    assert results[1] == results[0]
+
+
+def test_jobs_bad_utf8(tmp_path):
+    path = str(tmp_path / "utf8.po")
+    shutil.copy(path_of("utf8"), path)
+    for jobs in (1, 2):
+        args.po = [path]
+        args.jobs = jobs
+        with pytest.raises(UnicodeDecodeError):
+            cli.read_po(path, args)
@@ -0,0 +1,161 @@
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+TrigramIndex and MinHashIndex suggestions against a brute-force Jaccard scan
+"""
+import multiprocessing
+import random
+import sys
+
+import pytest
+
+import poutils
+from poutils import po_update
+from poutils import suggest
+
+
+def corpus(n, seed=1):
+    rng = random.Random(seed)
+    words = [
+        "".join(rng.choice("abcdefghij") for _ in range(rng.randint(2, 7)))
+        for _ in range(300)
+    ]
+    return rng, [" ".join(rng.choices(words, k=rng.randint(3, 15))) for _ in range(n)]
+
+
+def similarity(a, b):
+    return len(a & b) / len(a | b)
+
+
+def queries(rng, msgids, n):
+    for j in range(n):
+        words = rng.choice(msgids).split(" ")
+        for _ in range(rng.randint(1, 3)):
+            k = rng.randrange(len(words))
+            words[k] = words[k][::-1] + "x"
+        if j % 3 == 0:
+            words = words[: len(words) // 2 + 1]
+        yield " ".join(words)
+
+
+@pytest.fixture(params=["numpy", "exact"])
+def new_index(request, monkeypatch):
+    if request.param == "numpy":
+        if suggest.numpy is None:
+            pytest.skip("NumPy is not installed")
+    else:
+        monkeypatch.setattr(suggest, "numpy", None)
+    return suggest.new_index
+
+
+def test_best_match():
+    rng, msgids = corpus(2000)
+    index = suggest.TrigramIndex()
+    for msgid in msgids:
+        index.add(msgid, "ja " + msgid)
+    msgids = list(index.known)
+    grams = [suggest.grams(msgid) for msgid in msgids]
+    for query in queries(rng, msgids, 100):
+        g = suggest.grams(query)
+        best = max(similarity(g, h) for h in grams)
+        for t in (0.5, 0.6, 0.75):
+            match = index.suggest(query, threshold=t)
+            if best < t:
+                assert match is None
+            else:
+                score, msgid, msgstr = match
+                assert score == best
+                assert similarity(g, suggest.grams(msgid)) == best
+                assert msgstr == "ja " + msgid
+
+
+def test_minhash_match():
+    # the best match can be missed but what is found is scored exactly
+    if suggest.numpy is None:
+        pytest.skip("NumPy is not installed")
+    rng, msgids = corpus(2000)
+    index = suggest.MinHashIndex()
+    for msgid in msgids:
+        index.add(msgid, "ja " + msgid)
+    msgids = list(index.known)
+    grams = [suggest.grams(msgid) for msgid in msgids]
+    wanted = [0, 0]
+    found = [0, 0]
+    for query in queries(rng, msgids, 300):
+        g = suggest.grams(query)
+        best = max(similarity(g, h) for h in grams)
+        for t in (0.5, 0.6, 0.75):
+            match = index.suggest(query, threshold=t)
+            if match is not None:
+                score, msgid, msgstr = match
+                assert t <= score <= best
+                assert similarity(g, suggest.grams(msgid)) == score
+                assert msgstr == "ja " + msgid
+            if best >= t:
+                close = best >= 0.8
+                wanted[close] += 1
+                found[close] += match is not None and match[0] == best
+    assert found[1] == wanted[1] > 50
+    assert found[0] >= 0.95 * wanted[0] > 200
+
+
+def test_suggest_many(new_index, monkeypatch):
+    monkeypatch.setattr(suggest, "batch", 7)
+    rng, msgids = corpus(500)
+    index = new_index()
+    for msgid in msgids[:400]:
+        index.add(msgid, "ja " + msgid)
+    items = []
+    for msgid in msgids[300:] + list(queries(rng, msgids, 50)):
+        item = poutils.PotItem()
+        item.msgid = msgid
+        items.append(item)
+    items[3].msgstr = "ja"
+    items[4].obsolete = ["#~ "]
+    matches = index.suggest_many([item.msgid for item in items])
+    assert matches == [index.suggest(item.msgid) for item in items]
+    assert matches[:100] == [(1.0, msgid, "ja " + msgid) for msgid in msgids[300:400]]
+    filled = list(index.fill_items(items))
+    assert filled == items
+    for i, (item, match) in enumerate(zip(items, matches)):
+        if match is None or i in (3, 4):
+            assert item.msgstr in ("", "ja") and not item.is_fuzzy()
+        else:
+            assert (item.pmsgid, item.msgstr) == match[1:]
+            assert item.is_fuzzy()
+    assert 0 < sum(item.is_fuzzy() for item in items[100:]) < 150
+
+
+def test_fill(new_index, capsys):
+    index = new_index()
+    index.add("Open the file", "ファイルを開く")
+    item = poutils.PotItem()
+    item.msgid = "Open the files"
+    assert index.fill(item)
+    assert item.msgstr == "ファイルを開く"
+    assert item.pmsgid == "Open the file"
+    assert item.is_fuzzy()
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.parametrize("method", ["fork", "spawn"])
+def test_po_update_jobs(tmp_path, monkeypatch, capfd, method):
+    # the index is built once and reaches the worker processes whatever
+    # their start method is
+    context = multiprocessing.get_context(method)
+    monkeypatch.setattr(multiprocessing, "get_context", lambda *args: context)
+    tm = tmp_path / "tm.po"
+    tm.write_text('msgid "Open the file"\nmsgstr "ファイルを開く"\n')
+    files = []
+    for name in ("a.po", "b.po"):
+        (tmp_path / name).write_text('msgid "Open the files"\nmsgstr ""\n')
+        files.append(str(tmp_path / name))
+    argv = ["po_update", "-j", "2", "-s", str(tm)] + files
+    monkeypatch.setattr(sys, "argv", argv)
+    po_update.po_update()
+    assert capfd.readouterr().err.count("translated entries") == 1
+    for path in files:
+        master = poutils.PotData()
+        with open(path) as fp:
+            master.read_po(file=fp)
+        assert [item.msgstr for item in master] == ["ファイルを開く"]
+        assert master.items[0].is_fuzzy()
@@ -0,0 +1,85 @@
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+po_check --watch against full runs of po_check
+"""
+import argparse
+import os
+
+from poutils import po_check
+from poutils import watch
+
+entries = {
+    "good": '#. type: Content of: <para>\nmsgid "<b>good</b>"\nmsgstr "<b>bon</b>"\n',
+    "bad": '#. type: Content of: <para>\nmsgid "<b>bad</b>"\nmsgstr "<i>mal</i>"\n',
+    "bad2": '#. type: Content of: <para>\nmsgid "<b>bad2</b>"\nmsgstr "mal2</b>"\n',
+    "fixed": '#. type: Content of: <para>\nmsgid "<b>bad</b>"\nmsgstr "<b>mal</b>"\n',
+    "edited": '#. type: Content of: <para>\nmsgid "<b>good</b>"\nmsgstr "<b>bien</b>"\n',
+    "illegal": "bogus line\n",
+}
+
+args = argparse.Namespace(
+    force_check=False,
+    itstool=False,
+    no_cache=True,
+    entry_jobs=1,
+    raw=False,
+    msguniq=False,
+    parse_cache=False,
+    jobs=1,
+    profile=None,
+)
+
+
+def save(path, names):
+    with open(path, "w") as fp:
+        fp.write("\n".join(entries[name] for name in names))
+    # a new stamp even within the resolution of mtime
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+
+
+def test_warnings_of_whole_file(tmp_path):
+    path = str(tmp_path / "ja.po")
+    args.po = [path]
+    watcher = watch.Watcher(path)
+    for names, changed in [
+        (["good", "bad", "bad2"], 3),
+        (["edited", "bad", "bad2"], 1),
+        (["edited", "fixed", "bad2"], 1),
+        (["edited", "fixed", "bad2", "bad"], 2),
+        (["fixed", "bad2"], 2),
+    ]:
+        save(path, names)
+        counts = po_check.po_check_watch(path, args, watcher)
+        assert counts["changed"] == changed
+        full = po_check.po_check_file(path, args)
+        assert counts["warnings"] == full["warnings"]
+        with open(path + ".checked") as fp:
+            checked = fp.read()
+        counts = po_check.po_check_watch(path, args, watcher)
+        with open(path + ".checked") as fp:
+            assert fp.read() == checked
+
+
+def test_illegal_line(tmp_path, capsys):
+    # an illegal line is reported and skipped as by a full run of po_check
+    path = str(tmp_path / "ja.po")
+    args.po = [path]
+    watcher = watch.Watcher(path)
+    for names in [
+        ["good", "bad"],
+        ["good", "illegal", "bad", "bad2"],
+        ["edited", "bad", "bad2"],
+    ]:
+        save(path, names)
+        counts = po_check.po_check_watch(path, args, watcher)
+        out = capsys.readouterr().out
+        with open(path + ".checked") as fp:
+            checked = fp.read()
+        full = po_check.po_check_file(path, args)
+        assert out == capsys.readouterr().out
+        assert ("ERROR" in out) == ("illegal" in names)
+        assert counts["entries"] == full["entries"]
+        assert counts["warnings"] == full["warnings"]
+        with open(path + ".checked") as fp:
+            assert fp.read() == checked
@@ -0,0 +1,57 @@
+# vim:se tw=0 sts=4 ts=4 et ai:
+"""
+Built-in PO writer (PotData.write_uniq) against msguniq formatting
+"""
+import io
+import os
+import shutil
+
+import pytest
+
+import poutils
+
+data_dir = os.path.join(os.path.dirname(__file__), "data", "writer")
+
+
+def read_data(name):
+    with open(os.path.join(data_dir, name), encoding="utf-8") as fp:
+        return fp.read()
+
+
+def write_po(text, msguniq=False):
+    master = poutils.PotData()
+    master.read_po(file=io.StringIO(text))
+    fp = io.StringIO()
+    master.output_po(file=fp, msguniq=msguniq)
+    return fp.getvalue()
+
+
+def test_expected_output():
+    assert write_po(read_data("input.po")) == read_data("expected.po")
+
+
+def test_expected_output_is_stable():
+    expected = read_data("expected.po")
+    assert write_po(expected) == expected
+
+
+def test_single_line_too_long_after_keyword():
+    value = "a " * 36 + "bb"
+    assert poutils.wrap_po_string("msgid", value) == [
+        'msgid ""',
+        '"' + value + '"',
+    ]
+    assert poutils.wrap_po_string("msgid", "x" * 70) == ['msgid "' + "x" * 70 + '"']
+
+
+def test_lines_fit_page_width_unless_unbreakable():
+    for line in write_po(read_data("input.po")).splitlines():
+        if len(line) > poutils.page_width:
+            assert " " not in line
+
+
+@pytest.mark.skipif(shutil.which("msguniq") is None, reason="msguniq not installed")
+def test_same_as_msguniq():
+    for name in ("input.po", "expected.po"):
+        text = read_data(name)
+        assert write_po(text) == write_po(text, msguniq=True)